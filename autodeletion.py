@@ -1,413 +1,903 @@
 import os
 import sys
 import time
-from PyPDF2 import PdfReader
-from PIL import Image, ImageTk
+import threading
+import argparse
+import numpy as np
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-import tkinter as tk
-from tkinter import ttk, messagebox
-import textract
-from docx import Document
-import re
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
-from nltk.stem import WordNetLemmatizer
-# Initialize NLTK resources
-stop_words = set(stopwords.words('english'))
-ps = PorterStemmer()
-lemmatizer = WordNetLemmatizer()
-
-# Dictionary to store preprocessed text content of each file
-preprocessed_text_cache = {}
-
-class CheckboxTreeview(tk.Frame):
-    def __init__(self, master, **kwargs):
-        super().__init__(master, **kwargs)
-        self.checked_items = set()
-        self.treeview = ttk.Treeview(self, selectmode="extended", columns=("Filename", "Similarity"))
-        self.treeview.heading("#0", text="Check")
-        self.treeview.heading("Filename", text="Filename")
-        self.treeview.heading("Similarity", text="Similarity")
-        self.treeview.column("#0", width=50)  # Adjust the width of the Check column if needed
-        self.treeview.column("Filename", width=500)  # Adjust the width of the Filename column as needed
-        self.treeview.column("Similarity", width=100)  # Adjust the width of the Similarity column as needed
-        self.treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        checked_img = Image.open("checked.png")
-        checked_img = checked_img.resize((16, 16))  # Resize to 16x16 pixels
-
-        # Convert resized images to PhotoImage
-        self.checked_image = ImageTk.PhotoImage(checked_img)
-
-        self.treeview.bind("<Button-1>", self.toggle_checkbox)
-
-    def insert_checkbox(self, index, filename, similarity):
-        item_id = self.treeview.insert("", index, text="", values=(filename, similarity))
-        self.checked_items.discard(item_id)
-
-    def toggle_checkbox(self, event):
-        item_id = self.treeview.identify_row(event.y)
-        if item_id:
-            if item_id in self.checked_items:
-                self.treeview.item(item_id, image="")
-                self.checked_items.remove(item_id)
-            else:
-                self.treeview.item(item_id, image=self.checked_image)
-                self.checked_items.add(item_id)
+from fingerprint import (jaccard, winnow_window, iter_rolling_hashes, Winnower, HashSet, encode_text,
+                         fingerprint_set, iter_text_range)
+from fingerprint_store import FingerprintStore, Tail, file_signature
+from duplicates import find_exact_duplicates, BlockDigests, resume_block_digests
+from minhash import LSHIndex, shingle_hashes, minhash_signature, estimate_jaccard
+from extraction import extract_text_from_file, iter_extracted_text, ExtractionPool
+from pipeline import Pipeline, Stage, BatchStage
+from readiness import ReadinessTracker, close_events_supported
+from text_cache import TextCache
+from tokens import Vocabulary, iter_indexed_tokens, iter_token_codes, iter_word_codes
+from walker import walk_files, in_tree
+
+# Formats that are indexed and compared, both when walking the tree and for new files
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.doc', '.docx', '.rtf', '.html', '.htm', '.odt')  # Add more extensions as needed
+
+# Extracted text of recently used files, bounded by memory and checked against size and mtime
+TEXT_CACHE_BYTES = 256 * 1024 * 1024
+text_cache = TextCache(TEXT_CACHE_BYTES)
+
+# Fingerprints persisted across restarts, keyed by path, size, mtime and inode
+FINGERPRINT_DB = os.path.join(os.path.expanduser('~'), '.file_similarity', 'fingerprints.sqlite3')
+fingerprint_store = FingerprintStore(FINGERPRINT_DB)
+vocabulary = Vocabulary(fingerprint_store)  # Word ids for tokens mode
+
+# MinHash mode: 16 bands x 8 rows over a 128 value signature make pairs above
+# ~71% Jaccard likely candidates; fewer rows per band lower that threshold
+LSH_BANDS = 16
+LSH_ROWS = 8
+lsh_index = LSHIndex(LSH_BANDS, LSH_ROWS)
+
+STATUS_INTERVAL = 5  # Seconds between pipeline status lines while work is queued
+PROGRESS_INTERVAL = 2  # Seconds between progress lines while indexing the tree
+# While indexing the tree finished files are committed together, at least
+# every CHECKPOINT_INTERVAL seconds and every CHECKPOINT_BYTES of file data
+CHECKPOINT_INTERVAL = 1
+CHECKPOINT_BYTES = 512 * 1024
+def get_preprocessed_text(file_path):
+    """
+    Return the extracted text of a file, reusing the in-process cache.
+    """
+    return text_cache.get_or_load(file_path, extract_text_from_file)
 
-    def get_checked_items(self):
-        checked_items = []
-        for item_id in self.checked_items:
-            try:
-                item_values = self.treeview.item(item_id)
-                if item_values is not None:  # Check if the item exists in the treeview
-                    checked_items.append(item_values["values"][0])
-            except tk.TclError:  # Catch the TclError if the item is not found
-                pass
-        return checked_items
-    def select_items_above_similarity(self, threshold):
-        if self.checked_items:  # If some items are already checked, deselect all
-            self.deselect_all_items()
-        else:  # If no items are checked, select all above the threshold
-            for item_id in self.treeview.get_children():
-                similarity = float(self.treeview.item(item_id, "values")[1][:-1])
-                if similarity >= threshold:
-                    self.treeview.item(item_id, image=self.checked_image)
-                    self.checked_items.add(item_id)
-    def deselect_all_items(self):
-        for item_id in self.checked_items:
-            self.treeview.item(item_id, image="")
-        self.checked_items.clear()
-
-
-def rolling_hash(text, window_size):
-    """
-    Compute rolling hash values for all windows of size `window_size`.
-    """
-    hash_values = []
-    text_len = len(text)
-    prime = 101  # Choose a prime number
-    modulus = 2**32  # Typically a large prime number
-    hash_value = 0
-    for i in range(window_size):
-        hash_value = (hash_value * prime + ord(text[i])) % modulus
-    hash_values.append(hash_value)
-
-    for i in range(1, text_len - window_size + 1):
-        hash_value = (hash_value * prime - ord(text[i - 1]) * pow(prime, window_size, modulus) + ord(text[i + window_size - 1])) % modulus
-        hash_values.append(hash_value)
-    return hash_values
-
-def preprocess_text(text):
-    # Remove special characters, punctuation, and extra whitespaces
-    text = re.sub(r'[^A-Za-z0-9\s]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    # Convert text to lowercase
-    text = text.lower()
-    # Tokenize the text
-    words = word_tokenize(text)
-    # Remove stopwords
-    words = [word for word in words if word not in stop_words]
-    # Lemmatize words (or alternatively, use stemming with ps.stem(word))
-    words = [lemmatizer.lemmatize(word) for word in words]
-    # Join the preprocessed words back into a single string
-    preprocessed_text = ' '.join(words)
-    return preprocessed_text
-
-def extract_text_from_pdf(pdf_path):
-    print(f"Reading PDF: {pdf_path}")
-    with open(pdf_path, 'rb') as f:
-        reader = PdfReader(f)
-        text = ''
-        total_pages = len(reader.pages)
-        for i, page in enumerate(reader.pages, 1):
-            print(f"Processing page {i}/{total_pages}")
-            text += page.extract_text()
-        print("PDF reading complete.")     
-    # Preprocess the extracted text
-    preprocessed_text = preprocess_text(text)
-    return preprocessed_text
-def extract_text_from_docx(docx_path):
-    try:
-        doc = Document(docx_path)
-        text = ''
-        for paragraph in doc.paragraphs:
-            text += paragraph.text
-        
-        # Preprocess the extracted text
-        preprocessed_text = preprocess_text(text)
-        print(preprocessed_text)
-        return preprocessed_text
-    except Exception as e:
-        print(f"Error extracting text from {docx_path}: {e}")
+def fingerprint_scheme(window_size, guarantee=None, mode='rolling'):
+    # 'k' windows count characters, 'w' windows count words (tokens mode)
+    unit = 'w' if mode == 'tokens' else 'k'
+    if guarantee is None:
+        return f"{unit}{window_size}"
+    return f"{unit}{window_size}-t{guarantee}"
+
+def as_window_sizes(window_size):
+    """
+    Accept a single window size or a collection of them; return a sorted tuple.
+    """
+    if isinstance(window_size, int):
+        return (window_size,)
+    return tuple(sorted(set(window_size)))
+
+def parse_window_sizes(value):
+    """
+    Parse a window size argument: '10', '5,10,20' or a range like '5-20'.
+    """
+    window_sizes = set()
+    for part in value.split(','):
+        first, _, last = part.partition('-')
+        window_sizes.update(range(int(first), int(last or first) + 1))
+    if not window_sizes or min(window_sizes) < 1:
+        raise argparse.ArgumentTypeError(f"invalid window size: {value}")
+    return as_window_sizes(window_sizes)
+
+def file_fingerprints(file_path, window_size, guarantee=None, text=None, mode='rolling'):
+    """
+    Return the sorted unique rolling hashes of a file, reusing stored fingerprints.
+
+    In 'tokens' mode windows are made of words interned to integer ids
+    rather than characters, which gives far fewer fingerprints per file, and
+    window sizes and `guarantee` count words.
+
+    `window_size` may be a collection of sizes; fingerprints for all of them
+    that are not stored yet are computed in a single pass over the text and
+    a dict of window size -> hashes is returned. With a `guarantee` only the
+    winnowed hashes are kept; any match of at least that many characters
+    still shares a fingerprint. `text` is the already extracted text, if the
+    caller has it.
+    """
+    window_sizes = as_window_sizes(window_size)
+    schemes = {fingerprint_scheme(w, guarantee, mode): w for w in window_sizes}
+
+    def compute(missing):
+        sizes = [schemes[scheme] for scheme in missing]
+        text_chunks = [text] if text is not None else iter_extracted_text(file_path)
+        if mode == 'tokens':
+            text_chunks = iter_token_codes(text_chunks, vocabulary)
+        hashes = chunk_fingerprints(text_chunks, sizes, guarantee)
+        return {fingerprint_scheme(w, guarantee, mode): hashes[w] for w in sizes}
+
+    if mode == 'rolling' and text is None and file_path.lower().endswith('.txt'):
+        fingerprints = text_file_fingerprints(file_path, schemes, guarantee)
+    else:
+        fingerprints = fingerprint_store.get_many(file_path, list(schemes), compute)
+    if isinstance(window_size, int):
+        return fingerprints[fingerprint_scheme(window_size, guarantee, mode)]
+    return {w: fingerprints[scheme] for scheme, w in schemes.items()}
+
+def chunk_fingerprints(text_chunks, window_sizes, guarantee=None):
+    """
+    Return a dict of window size -> sorted unique (winnowed) hashes of a text in pieces.
+
+    The pieces are strings, or uint32 code arrays such as iter_token_codes yields.
+    """
+    hash_sets = {w: HashSet() for w in window_sizes}
+    winnowers = {w: Winnower(winnow_window(w, guarantee) if guarantee is not None else 1) for w in window_sizes}
+    for hash_values in iter_rolling_hashes(text_chunks, window_sizes):
+        for w in window_sizes:
+            hash_sets[w].add(winnowers[w].feed(hash_values[w]))
+    for w in window_sizes:
+        hash_sets[w].add(winnowers[w].finish())
+    return {w: hash_sets[w].result() for w in window_sizes}
+
+def appended_tails(file_path, schemes, guarantee, stat_result):
+    """
+    Return ({scheme: (Tail, fingerprints)}, BlockDigests) if the file has only grown since it was fingerprinted, else None.
+
+    The stored tails must agree on how much was hashed, the file must be
+    the same inode and larger now, and every block of that old length must
+    still hash to the stored block digests. Checking reads the old part
+    again, but only to hash it; the BlockDigests returned has taken those
+    bytes and goes on with the appended ones.
+    """
+    previous = {}
+    for scheme in schemes:
+        found = fingerprint_store.lookup_tail(file_path, scheme, stat_result)
+        if found is None:
+            return None
+        previous[scheme] = found
+    size, digest = found[0].size, found[0].digest
+    for tail, _ in previous.values():
+        if tail.size != size or not np.array_equal(tail.digest, digest):
+            return None
+        if guarantee is not None and tail.winnow_previous < 0:
+            return None  # Shorter than one winnowing window, where finish() picks hashes an append may not keep
+    if not 0 < size < stat_result.st_size:
         return None
-def extract_text_from_file(file_path):
-    """
-    Extract text content from a supported file format.
-    """
-    supported_extensions = ['.txt', '.pdf', '.doc', '.docx', '.rtf', '.html', '.htm', '.odt']  # Add more extensions as needed
-    file_extension = os.path.splitext(file_path)[1].lower()
-
-    if file_extension == '.pdf':
-        # Extract text from PDF
-        return extract_text_from_pdf(file_path)
-    elif file_extension == '.txt':
-        # Read text from plain text file
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    elif file_extension in ['.doc','.docx']:
-        text2 = extract_text_from_docx(file_path)
-        print(text2)
-        return text2
-    elif file_extension in ['.rtf', '.html', '.htm', '.odt']:
-        # Extract text from other supported formats using textract
-        try:
-            text = textract.process(file_path, encoding='utf-8').decode('utf-8')
-            return text
-        except Exception as e:
-            print(f"Error extracting text from {file_path}: {e}")
-            return ""
+    with open(file_path, 'rb') as f:
+        f.seek(size - 1)
+        if f.read(1) == b'\r':
+            return None  # A \r\n may have been split, and text mode reads it as one newline
+    digests = resume_block_digests(file_path, size, digest)
+    if digests is None:
+        return None
+    return previous, digests
+
+def text_file_fingerprints(file_path, schemes, guarantee=None):
+    """
+    Fingerprint a plain text file by characters, hashing only appended text when possible.
+
+    `schemes` maps scheme names to window sizes; a dict of scheme ->
+    fingerprints is returned. With the fingerprints a Tail is stored per
+    scheme. When the file is found changed later but has only been appended
+    to (see appended_tails), hashing resumes from the Tails: only the new
+    bytes are decoded and hashed and their fingerprints are added to the
+    stored ones, so apart from re-reading the old bytes to check them the
+    cost follows the size of the append, not of the file.
+    """
+    stat_result = os.stat(file_path)  # Everything is read up to and recorded against this one stat
+    fingerprints = {scheme: fingerprint_store.lookup(file_path, scheme, stat_result) for scheme in schemes}
+    missing = [scheme for scheme, hashes in fingerprints.items() if hashes is None]
+    if not missing:
+        return fingerprints
+    sizes = sorted(schemes[scheme] for scheme in missing)
+    longest = max(missing, key=schemes.get)
+    resumed = appended_tails(file_path, missing, guarantee, stat_result)
+    previous, digests = resumed if resumed is not None else (None, BlockDigests())
+    winnowers = {w: Winnower(winnow_window(w, guarantee) if guarantee is not None else 1) for w in sizes}
+    start, carry = 0, None
+    if previous is not None:
+        start, carry = previous[longest][0].size, previous[longest][0].codes
+        for scheme in missing:
+            tail = previous[scheme][0]
+            winnowers[schemes[scheme]].restore(tail.carry, tail.winnow_offset, tail.winnow_previous)
+        print(f"Fingerprinting {stat_result.st_size - start} appended bytes of {file_path}")
+    keep = sizes[-1] - 1
+    last_codes = carry if carry is not None else np.empty(0, dtype=np.uint32)
+
+    def codes():
+        nonlocal last_codes
+        for text in iter_text_range(file_path, start, stat_result.st_size, digests=digests):
+            chunk = encode_text(text)
+            if len(chunk) < keep:
+                chunk_tail = np.concatenate([last_codes, chunk])
+            else:
+                chunk_tail = chunk
+            last_codes = chunk_tail[max(len(chunk_tail) - keep, 0):].astype(np.uint32)
+            yield chunk
+
+    hash_sets = {w: HashSet() for w in sizes}
+    for hash_values in iter_rolling_hashes(codes(), sizes, carry):
+        for w in sizes:
+            hash_sets[w].add(winnowers[w].feed(hash_values[w]))
+    for w in sizes:
+        hash_sets[w].add(winnowers[w].finish())
+
+    if previous is None:
+        for scheme in missing:
+            fingerprints[scheme] = hash_sets[schemes[scheme]].result()
+        fingerprint_store.save_many([(file_path, scheme, fingerprints[scheme], stat_result) for scheme in missing])
     else:
-        print(f"Unsupported file format: {file_extension}")
-        return ""
+        entries = []
+        for scheme in missing:
+            old = previous[scheme][1]
+            new = hash_sets[schemes[scheme]].result()
+            positions = np.minimum(np.searchsorted(old, new), max(len(old) - 1, 0))
+            added = new[old[positions] != new] if len(old) else new
+            fingerprints[scheme] = fingerprint_set(np.concatenate([old, added]))
+            entries.append((file_path, scheme, fingerprints[scheme], added, stat_result))
+        fingerprint_store.extend_many(entries)
+    # Only leave a resume point if the file did not change while it was read
+    digest = digests.result()
+    if digests.size == stat_result.st_size and file_signature(file_path) == file_signature(file_path, stat_result):
+        for scheme in missing:
+            w = schemes[scheme]
+            tail = Tail(stat_result.st_size, digest, last_codes[max(len(last_codes) - (w - 1), 0):],
+                        *winnowers[w].state())
+            fingerprint_store.save_tail(file_path, scheme, tail, stat_result)
+    return fingerprints
+
+def minhash_scheme(shingle_size):
+    return f"minhash-k{shingle_size}-n{LSH_BANDS * LSH_ROWS}"
+
+def file_minhash(file_path, shingle_size, text=None):
+    """
+    Return the MinHash signature of a file's word shingles and add it to the LSH index.
+    """
+    def compute():
+        hashes = shingle_hashes(text if text is not None else get_preprocessed_text(file_path), shingle_size)
+        return minhash_signature(hashes, LSH_BANDS * LSH_ROWS)
 
+    signature = fingerprint_store.get_signature(file_path, minhash_scheme(shingle_size), compute)
+    lsh_index.insert(os.path.abspath(file_path), signature)
+    return signature
 
 def find_similarity(file1, file2, window_size):
     """
     Find similarity between two text files using rolling hashing.
     """
     print(f"Calculating similarity between {file1} and {file2}")
-    text1 = preprocessed_text_cache.get(file1)
-    if text1 is None:
-        text1 = extract_text_from_file(file1)
-        preprocessed_text_cache[file1] = text1
-
-    text2 = preprocessed_text_cache.get(file2)
-    if text2 is None:
-        text2 = extract_text_from_file(file2)
-        preprocessed_text_cache[file2] = text2
+    hash_values1 = file_fingerprints(file1, window_size)
+    hash_values2 = file_fingerprints(file2, window_size)
 
-    hash_values1 = set(rolling_hash(text1, window_size))
-    hash_values2 = set(rolling_hash(text2, window_size))
-
-    common_hashes = hash_values1.intersection(hash_values2)
-    similarity = (len(common_hashes) / (len(hash_values1) + len(hash_values2) - len(common_hashes))) * 100
+    similarity = jaccard(hash_values1, hash_values2) * 100
 
     print(f"Similarity calculation complete.")
     return similarity
 
-def find_related_files(directory, file1, window_size):
+def index_schemes(window_size, mode='rolling', guarantee=None):
+    """
+    Return the store schemes a file needs to be fully indexed.
+    """
+    if mode == 'minhash':
+        return [minhash_scheme(window_size)]
+    return [fingerprint_scheme(w, guarantee, mode) for w in as_window_sizes(window_size)]
+
+def is_indexed(file_path, window_size, mode='rolling', guarantee=None, stat_result=None):
+    return all(fingerprint_store.has(file_path, scheme, stat_result) for scheme in index_schemes(window_size, mode, guarantee))
+
+def index_file(file_path, window_size, mode='rolling', guarantee=None, text=None):
+    """
+    Fingerprint (or MinHash) a file and add it to the index, unless it is current.
+    """
+    if mode == 'minhash':
+        file_minhash(file_path, window_size, text)
+    else:
+        file_fingerprints(file_path, window_size, guarantee, text, mode)
+
+def borrow_duplicate_fingerprints(file1, duplicates, window_size, mode='rolling', guarantee=None):
+    """
+    Copy stored fingerprints from a byte-identical file to file1, scheme by scheme.
+    """
+    for scheme in index_schemes(window_size, mode, guarantee):
+        if fingerprint_store.has(file1, scheme):
+            continue
+        for path in duplicates:
+            if mode == 'minhash':
+                signature = fingerprint_store.lookup_signature(path, scheme)
+                if signature is not None:
+                    fingerprint_store.save_signature(file1, scheme, signature)
+                    break
+            else:
+                hash_values = fingerprint_store.lookup(path, scheme)
+                if hash_values is not None:
+                    fingerprint_store.save(file1, scheme, hash_values)
+                    break
+
+def find_duplicates_in_directory(directory, file1):
+    """
+    Return the files in the directory that are byte-identical to file1.
+    """
+    directory = os.path.abspath(directory)
+    candidates = [path for path in fingerprint_store.paths_with_size(os.path.getsize(file1))
+                  if in_tree(path, directory)]
+    return find_exact_duplicates(file1, candidates, fingerprint_store)
+
+def find_related_files(directory, file1, window_size, mode='rolling', guarantee=None):
     """
     Find and compare similarity of related files in the directory to file1.
     """
-    related_files = []
-    new_file_size = os.path.getsize(file1)
-    supported_extensions = ['.txt', '.pdf', '.doc', '.docx', '.rtf', '.html', '.htm', '.odt']  # Add more extensions as needed
-    for filename in os.listdir(directory):
-        if filename != file1 and os.path.splitext(filename)[1].lower() in supported_extensions:
-            filepath = os.path.join(directory, filename)
+    results = find_related_files_batch(directory, [file1], window_size, mode, guarantee)
+    return results[0][1] if results else []
+
+def find_related_files_batch(directory, new_files, window_size, mode='rolling', guarantee=None):
+    """
+    Compare a batch of new files with the directory in one join over the index.
+
+    Byte-identical copies are found first from sizes and content hashes and
+    reported at 100%; the new file then borrows their stored fingerprints, so
+    a copy is never extracted or hashed. Other candidates come from the
+    inverted fingerprint index, self-joined once for the whole batch, so only
+    files sharing at least one fingerprint are ever looked at. With several
+    window sizes the reported similarity is the mean of the per-window
+    similarities.
+
+    Returns (file_path, related_files) for each new file, in order. A file is
+    only compared with files that were there before it, so as with one event
+    per file, the newest of a burst of copies is the one kept. Files that
+    can no longer be read, usually because they were deleted in the
+    meantime, are left out and the rest of the batch is still compared.
+    """
+    directory = os.path.abspath(directory)
+    new_files = [os.path.abspath(path) for path in new_files]
+    position = {path: i for i, path in enumerate(new_files)}
+    duplicates = {}
+    skip = {}  # file -> paths not to report for it
+    for i, file1 in enumerate(new_files):
+        try:
+            found = find_duplicates_in_directory(directory, file1)
+            borrow_duplicate_fingerprints(file1, found, window_size, mode, guarantee)
+        except OSError:
+            print(f"Skipping vanished file: {file1}")
+            continue
+        duplicates[file1] = [path for path in found if position.get(path, -1) < i]
+        skip[file1] = set(found) | set(new_files[i:])
+    new_files = [file1 for file1 in new_files if file1 in duplicates]
+    if mode == 'minhash':
+        results = []
+        for file1 in new_files:
+            try:
+                related_files = find_related_files_minhash(directory, file1, window_size, duplicates[file1], skip[file1])
+            except OSError:
+                print(f"Skipping vanished file: {file1}")
+                continue
+            results.append((file1, related_files))
+        return results
+
+    window_sizes = as_window_sizes(window_size)
+    sizes = {}
+    counts = {}  # file -> window size -> number of fingerprints
+    for file1 in new_files:
+        try:
+            sizes[file1] = os.path.getsize(file1)
+            fingerprints1 = file_fingerprints(file1, window_sizes, guarantee, mode=mode)  # Also adds file1 to the index
+        except OSError:
+            print(f"Skipping vanished file: {file1}")
+            continue
+        counts[file1] = {w: len(hash_values) for w, hash_values in fingerprints1.items()}
+    new_files = [file1 for file1 in new_files if file1 in counts]
+    similarities = {file1: {} for file1 in new_files}
+    for w in window_sizes:
+        for file1, filepath, size, shared, count in fingerprint_store.query_many(new_files, fingerprint_scheme(w, guarantee, mode)):
+            if filepath in skip[file1] or not in_tree(filepath, directory):
+                continue
             # Check file size
-            if os.path.getsize(filepath) <= new_file_size + new_file_size/2:
-                similarity = find_similarity(file1, filepath, window_size)
-                related_files.append((filename, similarity))
+            if size <= sizes[file1] + sizes[file1]/2:
+                similarity = shared / (counts[file1][w] + count - shared)
+                similarities[file1][filepath] = similarities[file1].get(filepath, 0) + similarity
+    results = []
+    for file1 in new_files:
+        related_files = [(os.path.relpath(path, directory), 100.0) for path in duplicates[file1]]
+        for filepath, similarity in similarities[file1].items():
+            if os.path.exists(filepath):
+                related_files.append((os.path.relpath(filepath, directory), similarity / len(window_sizes) * 100))
+        results.append((file1, related_files))
+    return results
+
+def aggregate_related_files(results):
+    """
+    Merge the per-file results of a batch into one list for a single view.
+
+    Each related file is listed once, with the highest similarity it has to
+    any file of the batch.
+    """
+    best = {}
+    for file1, related_files in results:
+        for filename, similarity in related_files:
+            best[filename] = max(similarity, best.get(filename, similarity))
+    return list(best.items())
+
+def find_related_files_minhash(directory, file1, shingle_size, duplicates=(), skip=()):
+    """
+    Find near-duplicates of file1 through the MinHash LSH index.
+
+    Only files sharing an LSH band with file1 are compared, and their
+    similarity is the Jaccard estimate from the two signatures.
+    """
+    directory = os.path.abspath(directory)
+    related_files = [(os.path.relpath(path, directory), 100.0) for path in duplicates]
+    new_file_size = os.path.getsize(file1)
+    file1 = os.path.abspath(file1)
+    signature1 = file_minhash(file1, shingle_size)
+    for filepath in lsh_index.query(signature1):
+        if filepath == file1 or filepath in duplicates or filepath in skip or not in_tree(filepath, directory):
+            continue
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:  # Deleted since it was indexed
+            continue
+        # Check file size
+        if size <= new_file_size + new_file_size/2:
+            similarity = estimate_jaccard(signature1, lsh_index.signatures[filepath]) * 100
+            related_files.append((os.path.relpath(filepath, directory), similarity))
     return related_files
 
-def callSimilar(file_path, directory, window_size):
+def fingerprint_task(file_path, window_size, mode='rolling', guarantee=None):
+    """
+    Extract and fingerprint one file in an index_directory worker process.
+
+    The store is not touched here; the parent saves what comes back:
+    (file_path, stat_result, result), where result is a dict of scheme ->
+    fingerprints, a MinHash signature, or in tokens mode the file's words
+    as iter_indexed_tokens pieces, since word ids can only be handed out by
+    the store.
+    """
+    stat_result = os.stat(file_path)  # Stat before reading so edits made meanwhile look stale
+    if mode == 'minhash':
+        hashes = shingle_hashes(extract_text_from_file(file_path) or "", window_size)
+        return file_path, stat_result, minhash_signature(hashes, LSH_BANDS * LSH_ROWS)
+    if mode == 'tokens':
+        return file_path, stat_result, list(iter_indexed_tokens(iter_extracted_text(file_path)))
+    hashes = chunk_fingerprints(iter_extracted_text(file_path), as_window_sizes(window_size), guarantee)
+    return file_path, stat_result, {fingerprint_scheme(w, guarantee, mode): hash_values for w, hash_values in hashes.items()}
+
+def save_fingerprint_tasks(results, window_size, mode='rolling', guarantee=None):
+    """
+    Store what fingerprint_task returned for a batch of files, in one transaction.
+    """
+    if mode == 'minhash':
+        scheme = minhash_scheme(window_size)
+        fingerprint_store.save_signatures((file_path, scheme, signature, stat_result)
+                                          for file_path, stat_result, signature in results)
+        for file_path, _, signature in results:
+            lsh_index.insert(os.path.abspath(file_path), signature)
+        return
+    entries = []
+    for file_path, stat_result, result in results:
+        if mode == 'tokens':
+            window_sizes = as_window_sizes(window_size)
+            hashes = chunk_fingerprints(iter_word_codes(result, vocabulary), window_sizes, guarantee)
+            result = {fingerprint_scheme(w, guarantee, mode): hashes[w] for w in window_sizes}
+        entries.extend((file_path, scheme, hash_values, stat_result) for scheme, hash_values in result.items())
+    fingerprint_store.save_many(entries)
+
+class IndexProgress:
+    """
+    Counters for a run of index_directory, printed every PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, interval=PROGRESS_INTERVAL):
+        self.interval = interval
+        self.start = self.last_report = time.monotonic()
+        self.found = 0
+        self.current = 0  # Already indexed and unchanged, skipped
+        self.indexed = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        print(f"Indexing: {self.found} files found, {self.current} already indexed, {self.indexed} indexed, "
+              f"{self.failed} failed | {self.indexed / elapsed:.1f} files/s, "
+              f"{self.bytes / elapsed / (1024 * 1024):.1f} MiB/s, {elapsed:.0f}s")
+
+def index_directory(directory, window_size, mode='rolling', guarantee=None, workers=None, pool=None):
+    """
+    Make sure every supported file in the directory tree is in the fingerprint index.
+
+    The files stored under `directory` with their (size, mtime_ns, inode)
+    are the snapshot of the tree as of the last run. It is loaded in one
+    query and compared with a single walk of the tree, so unchanged files
+    cost no store lookup, files that are gone are dropped from the store,
+    and only new, changed or not yet fingerprinted files are worked on.
+
+    Files are extracted and fingerprinted in the processes of `pool`, an
+    ExtractionPool with its per-format limits (a new one with `workers`
+    processes if not given), while this process walks the tree and stores
+    the results. Finished files are committed together every
+    CHECKPOINT_INTERVAL seconds, and the store is the checkpoint: after an
+    interruption the next run skips every file already stored at its
+    current size, mtime and inode and only does the work that is left.
+    Files that cannot be fingerprinted are remembered with their signature
+    and only tried again once they change.
+
+    Returns the paths added or changed since the last completed scan, so
+    the watcher can catch up on what it missed. They are kept in the store
+    until a scan of the whole tree finishes, so an interrupted scan loses
+    none of them. Until a scan of `directory` has finished once, every file
+    is still being indexed for the first time and the list is empty.
+    """
+    directory = os.path.abspath(directory)
+    if mode == 'minhash':
+        for filepath, signature in fingerprint_store.signatures(minhash_scheme(window_size)):
+            lsh_index.insert(filepath, signature)
+    snapshot = fingerprint_store.snapshot(directory, index_schemes(window_size, mode, guarantee))
+    failures = fingerprint_store.failures(directory)
+    completed = fingerprint_store.completed_scan(directory)  # Otherwise nothing can be told apart from new
+    changed = []  # Not yet recorded with add_changes
+    retried = []  # Paths whose recorded failure is out of date
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ExtractionPool(workers)
+    progress = IndexProgress()
+    finished = []  # fingerprint_task results not committed yet
+    failed = []  # (path, stat_result) of files that could not be fingerprinted
+    stats = {}  # path -> stat_result of files being worked on
+    last_checkpoint = time.monotonic()
+
+    def checkpoint():
+        nonlocal last_checkpoint
+        fingerprint_store.add_changes(changed)  # Before the files, so no change is ever dropped
+        changed.clear()
+        fingerprint_store.remove_failures(retried)
+        retried.clear()
+        fingerprint_store.save_failures(failed)
+        failed.clear()
+        save_fingerprint_tasks(finished, window_size, mode, guarantee)
+        progress.indexed += len(finished)
+        progress.bytes += sum(stat_result.st_size for _, stat_result, _ in finished)
+        finished.clear()
+        last_checkpoint = time.monotonic()
+
+    def files_to_index():
+        for filepath, stat_result in walk_files(directory, SUPPORTED_EXTENSIONS):
+            progress.found += 1
+            stored = snapshot.pop(filepath, None)
+            signature = file_signature(filepath, stat_result)
+            if filepath in failures:
+                if stored is None and failures.pop(filepath) == signature:  # Failed before and unchanged
+                    progress.failed += 1
+                    progress.report()
+                    continue
+                retried.append(filepath)
+            if stored is None or stored[:3] != signature:
+                if completed:
+                    changed.append(filepath)
+            elif stored[3]:  # Unchanged and fingerprinted for every scheme
+                progress.current += 1
+                progress.report()
+                continue
+            stats[filepath] = stat_result
+            yield filepath
+
+    results = pool.submit_many(fingerprint_task, files_to_index(), window_size, mode, guarantee)
+    try:
+        for finish_order, filepath, future in results:
+            stat_result = stats.pop(filepath)
+            try:
+                finished.append(future.result())
+                print(f"Extracted {filepath} ({finish_order} finished, {progress.found} found so far)")
+            except Exception as e:
+                print(f"Error indexing {filepath}: {e}")
+                failed.append((filepath, stat_result))
+                progress.failed += 1
+            if (time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL
+                    or sum(stat_result.st_size for _, stat_result, _ in finished) >= CHECKPOINT_BYTES):
+                checkpoint()
+            progress.report()
+        checkpoint()
+    except KeyboardInterrupt:
+        # Files since the last checkpoint are redone next time; committing them now could take a while
+        results.close()
+        if own_pool:
+            pool.shutdown(wait=False)
+        progress.report(force=True)
+        print("Indexing interrupted; run again to resume from the last checkpoint.")
+        raise
+    if own_pool:
+        pool.shutdown()
+    progress.report(force=True)
+    if snapshot:  # Stored but no longer in the tree
+        fingerprint_store.remove_many(snapshot)
+        for filepath in snapshot:
+            lsh_index.remove(filepath)
+        print(f"Removed {len(snapshot)} deleted files from the index")
+    fingerprint_store.remove_failures(failures)  # Failed files that are gone
+    changed = fingerprint_store.complete_scan(directory)
+    if changed:
+        print(f"{len(changed)} files were added or changed since the last run")
+    return changed
+
+def callSimilar(file_path, directory, window_size, mode='rolling', guarantee=None):
     file1 = file_path
-    related_files = find_related_files(directory, file1, window_size)
+    related_files = find_related_files(directory, file1, window_size, mode, guarantee)
     print(f"Similarity of {file1} with other files in the directory:")
     for filename, similarity in related_files:
         print(f"{filename}: {similarity:.2f}%")
 
     return related_files
 
+def callSimilarBatch(file_paths, directory, window_size, mode='rolling', guarantee=None):
+    results = find_related_files_batch(directory, file_paths, window_size, mode, guarantee)
+    for file1, related_files in results:
+        print(f"Similarity of {file1} with other files in the directory:")
+        for filename, similarity in related_files:
+            print(f"{filename}: {similarity:.2f}%")
+
+    return aggregate_related_files(results)
+
 class NewFileHandler(FileSystemEventHandler):
-    def __init__(self, directory, window_size, delay=5):
+    """
+    Hand new files to a staged pipeline instead of working on the observer thread.
+
+    on_created only enqueues the path; worker threads wait for the file to be
+    completely written (see ReadinessTracker), extract its text and
+    fingerprint it, so one slow file no longer holds up the events behind it.
+    Files that become ready close together are compared with the directory
+    as one batch and shown in a single window.
+
+    The index follows the tree in place: a deleted file is dropped from the
+    store, the LSH index and the text cache, a rename only changes the
+    stored path, and an indexed file that is modified is re-fingerprinted
+    on its own, through a second, shorter pipeline, without being compared.
+    """
+
+    def __init__(self, directory, window_size, mode='rolling', guarantee=None, workers=None, queue_size=64,
+                 close_events=False, batch_window=0.5, gui=None):
         self.directory = directory
+        self.gui = gui  # GuiService that shows results; None only prints them
         self.window_size = window_size
-        self.delay = delay  # Delay in seconds
+        self.readiness = ReadinessTracker(close_events)  # close_events: the observer reports close-after-write
+        self.mode = mode  # 'rolling' (character) or 'tokens' (word) fingerprints, or 'minhash' signatures
+        self.guarantee = guarantee  # Winnow rolling fingerprints down to this match length
+        self.pool = ExtractionPool(workers)
+        self.lock = threading.Lock()
+        self.submitted = set()  # Paths the observer reported before catch_up ran; None afterwards
+        self.modified = set()  # Indexed files waiting to be re-fingerprinted
+        self.pipeline = Pipeline([
+            Stage('ready', self.wait_until_ready, workers=8, maxsize=queue_size),
+            Stage('extract', self.extract, workers=self.pool.max_workers, maxsize=queue_size),
+            Stage('fingerprint', self.fingerprint, workers=2, maxsize=queue_size),
+            BatchStage('compare', self.compare, window=batch_window, maxsize=queue_size),
+            Stage('notify', self.notify, maxsize=queue_size),
+        ])
+        self.updates = Pipeline([
+            Stage('ready', self.wait_until_rewritten, workers=2, maxsize=queue_size),
+            Stage('refingerprint', self.refingerprint, workers=2, maxsize=queue_size),
+        ])
+
+    def wait_until_ready(self, file_path):
+        if not self.readiness.wait(file_path):
+            print(f"Skipping vanished file: {file_path}")
+            return None
+        return file_path
+
+    def extract(self, file_path):
+        if is_indexed(file_path, self.window_size, self.mode, self.guarantee):
+            return file_path, None, ()
+        duplicates = find_duplicates_in_directory(self.directory, file_path)
+        if duplicates:
+            return file_path, None, duplicates  # Fingerprints are copied, nothing to extract or hash
+        if not file_path.endswith('.txt'):  # Plain text is streamed while fingerprinting
+            self.index_in_pool(file_path)
+        return file_path, None, ()
+
+    def index_in_pool(self, file_path):
+        """
+        Extract and fingerprint a document in the pool, as index_directory does.
+
+        Its text is streamed and hashed in the worker, so only the
+        fingerprints come back, however large the document is.
+        """
+        result = self.pool.run(fingerprint_task, file_path, self.window_size, self.mode, self.guarantee)
+        save_fingerprint_tasks([result], self.window_size, self.mode, self.guarantee)
+
+    def fingerprint(self, item):
+        file_path, text, duplicates = item
+        borrow_duplicate_fingerprints(file_path, duplicates, self.window_size, self.mode, self.guarantee)
+        index_file(file_path, self.window_size, self.mode, self.guarantee, text)
+        return file_path
+
+    def compare(self, file_paths):
+        return file_paths, callSimilarBatch(file_paths, self.directory, self.window_size, self.mode, self.guarantee)
+
+    def notify(self, item):
+        file_paths, output = item
+        for file_path in file_paths:
+            print(f"New file created: {file_path}")
+        if self.gui is not None:
+            # Only the newest file never appears in the merged results
+            self.gui.show(output, file_paths[-1], batch_size=len(file_paths))
+
+    def wait_until_rewritten(self, file_path):
+        try:
+            return self.wait_until_ready(file_path)
+        finally:
+            with self.lock:
+                self.modified.discard(file_path)  # Writes from here on queue another pass
+
+    def refingerprint(self, file_path):
+        if is_indexed(file_path, self.window_size, self.mode, self.guarantee):
+            return None
+        if file_path.endswith('.txt'):
+            index_file(file_path, self.window_size, self.mode, self.guarantee)
+        else:
+            self.index_in_pool(file_path)
+        print(f"Re-fingerprinted modified file: {file_path}")
+        return file_path
+
+    def forget(self, path):
+        """
+        Drop everything indexed or cached for `path`, a file or a whole directory.
+        """
+        removed = [os.path.abspath(path), *fingerprint_store.snapshot(path)]
+        fingerprint_store.remove_many(removed)
+        for filepath in removed:
+            lsh_index.remove(filepath)
+        text_cache.discard(path)
+
+    def move(self, src, dest):
+        """
+        Follow a rename of a file or directory without recomputing anything.
+
+        Returns True if anything was indexed under `src`.
+        """
+        moved = fingerprint_store.move(src, dest)
+        src = os.path.abspath(src)
+        dest = os.path.abspath(dest)
+        for filepath in [key for key in list(lsh_index.signatures) if key == src or in_tree(key, src)]:
+            lsh_index.move(filepath, dest + filepath[len(src):])
+        text_cache.move(src, dest)
+        return moved > 0
+
+    def is_relevant(self, file_path):
+        # Partial downloads (.crdownload, .part, ...) fail this check and are
+        # picked up by on_moved once they are renamed to their final name
+        if os.path.splitext(file_path)[1].lower() not in SUPPORTED_EXTENSIONS:
+            print(f"Skipping non-relevant file: {file_path}")
+            return False
+        return True
+
+    def submit(self, file_path):
+        with self.lock:
+            if self.submitted is not None:
+                self.submitted.add(os.path.abspath(file_path))
+        self.pipeline.submit(file_path)
+
+    def catch_up(self, file_paths):
+        """
+        Process files that were added or changed while the watcher was not running.
+
+        They are complete already, so they skip the readiness wait. Files the
+        observer reported since it started are in the pipeline already and
+        are not submitted twice.
+        """
+        with self.lock:
+            submitted, self.submitted = self.submitted, None
+        for file_path in file_paths:
+            if os.path.abspath(file_path) in submitted:
+                continue
+            self.readiness.expect(file_path)
+            self.readiness.mark_closed(file_path)
+            self.pipeline.submit(file_path)
 
     def on_created(self, event):
+        if event.is_directory or not self.is_relevant(event.src_path):
+            return
+        self.readiness.expect(event.src_path)
+        self.submit(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.readiness.mark_closed(event.src_path)
+
+    def on_moved(self, event):
         if event.is_directory:
+            self.move(event.src_path, event.dest_path)
             return
-        
-        file_path = event.src_path
-        # Check if the file is a temporary file (e.g., .crdownload)
-        if file_path.endswith('.crdownload') or not file_path.endswith(('.txt', '.pdf', '.docx', '.doc', '.rtf')):
-            print(f"Skipping non-relevant file: {file_path}")
+        if not self.is_relevant(event.dest_path):
+            self.forget(event.src_path)
             return
-        
-        # Wait for the file to be completely downloaded
-        time.sleep(self.delay)
-        
-        output = callSimilar(file_path, self.directory, self.window_size)
-        print(f"New file created: {file_path}")
-        popup_window(output, file_path)
-
-    # def on_modified(self, event):
-    #     if event.is_directory:
-    #         return
-    #     file_path = event.src_path
-    #     time.sleep(self.delay)  # Introduce a delay before processing the file
-    #     output = callSimilar(file_path, self.directory, self.window_size)
-    #     print(f"File modified: {file_path}")
-    #     popup_window(output, file_path)
-
-def popup_window(files, file_path, autocheck=True):
-    def delete_selected_files():
-        nonlocal files
-        checked_items = checkbox_treeview.get_checked_items()
-        files_to_delete = []  # Accumulate files to delete
-        for item in checked_items:
-            selected_filename = item
-            selected_file = next((file for file in files if file[0] == selected_filename), None)
-            if selected_file:
-                files_to_delete.append(selected_file)  # Accumulate the file object
-        if files_to_delete:
-            # Construct a confirmation message listing all files to be deleted
-            confirmation_message = f"Are you sure you want to delete the following files?\n\n"
-            confirmation_message += "\n".join(file[0] for file in files_to_delete)
-            # Display a confirmation messagebox
-            if messagebox.askyesno("Confirm Deletion", confirmation_message):
-                # Delete files and display a success message
-                for file_to_delete in files_to_delete:
-                    files.remove(file_to_delete)
-                    filepath = os.path.join(directory, file_to_delete[0])
-                    try:
-                        os.remove(filepath)
-                    except OSError as e:
-                        messagebox.showerror("Error", f"Failed to delete {file_to_delete[0]}: {e}")
-                messagebox.showinfo("Files Deleted", "Selected files have been deleted successfully.")
-                refresh_treeview()
-        elif checked_items:  # Add this condition to check if any files are selected for deletion
-            messagebox.showinfo("No Files Selected", "No files selected for deletion.")
-
-    def auto_delete_selected_files():
-        nonlocal files
-        checked_items = checkbox_treeview.get_checked_items()
-        files_to_delete = []
-        for item in checked_items:
-            selected_filename = item
-            selected_file = next((file for file in files if file[0] == selected_filename), None)
-            if selected_file:
-                files.remove(selected_file)
-                files_to_delete.append(selected_filename)
-        auto_checked_for_deletion = [filename for filename in autochecked_files if filename not in files_to_delete]
-        if auto_checked_for_deletion:
-                # Delete auto-checked files and display a success message
-            for filename in auto_checked_for_deletion:
-                filepath = os.path.join(directory, filename)
-                try:
-                    os.remove(filepath)
-                except OSError as e:
-                    messagebox.showerror("Error", f"Failed to delete {filename}: {e}")
-            messagebox.showinfo("Files Deleted", "Auto-checked files with 100% similarity have been deleted successfully.")
-            # Remove auto-checked files from the list before refreshing the treeview
-            files = [file for file in files if file[0] not in auto_checked_for_deletion]
-            refresh_treeview()
-    def refresh_treeview():
-        checkbox_treeview.treeview.delete(*checkbox_treeview.treeview.get_children())
-        for filename, similarity in files:
-            cur_file = os.path.basename(file_path)
-            if filename != cur_file:
-                checkbox_treeview.insert_checkbox(tk.END, filename, f"{similarity:.2f}%")
-
-    def toggle_select(threshold, button):
-        if button.cget('text') != 'Deselect':
-            checkbox_treeview.select_items_above_similarity(threshold)  # Adjust threshold as needed
-            button.config(text='Deselect')
-        else:
-            checkbox_treeview.deselect_all_items()
-            button.config(text=f"Select {threshold}")
-
-
-    root = tk.Tk()
-    root.title("File Similarity Checker")
-    root.geometry("900x700")
-    root.attributes('-topmost', True)
-    main_frame = tk.Frame(root)
-    main_frame.pack(pady=5)
-
-    checkbox_treeview = CheckboxTreeview(main_frame)
-    checkbox_treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-    item_ids = {}  # Dictionary to store item IDs corresponding to filenames
-    autochecked_files = []  
-    matching=""# Files to be auto-checked
-    checkIf=0
-    for filename, similarity in files:
-        cur_file = os.path.basename(file_path)
-        if filename != cur_file:
-            item_id = checkbox_treeview.insert_checkbox(tk.END, filename, f"{similarity:.2f}%")
-            item_ids[filename] = item_id  # Store item ID corresponding to filename
-            if autocheck and similarity == 100 and checkIf==1 or checkIf==0:
-                autochecked_files.append(filename)
-                matching="100"
-                checkIf=1
-            elif autocheck and similarity >= 90 and checkIf==2 or checkIf==0:
-                autochecked_files.append(filename)
-                matching="Above 90"
-                checkIf=2
-            elif autocheck and similarity >= 80 and checkIf==3 or checkIf==0:
-                autochecked_files.append(filename)
-                matching="Above 80"
-                checkIf=3
-    label = tk.Label(root, text=f"{file_path}")
-    label.pack(pady=5)
-
-    delete_button = tk.Button(root, text="Delete Selected Files", command=delete_selected_files)
-    delete_button.pack(pady=5)
-
-
-    select_90_button = tk.Button(root, text="Select 90", command=lambda: toggle_select(90, select_90_button))
-    select_90_button.pack(pady=5)
-
-    select_80_button = tk.Button(root, text="Select 80", command=lambda: toggle_select(80, select_80_button))
-    select_80_button.pack(pady=5)
-
-    if autocheck and autochecked_files:
-        # Automatically select files with 100% similarity
-        for filename in autochecked_files:
-            item_id = item_ids.get(filename)
-            if item_id:
-                checkbox_treeview.treeview.selection_set(item_id)
-
-        confirmation_message = f"The following files have {matching}% similarity with {os.path.basename(file_path)}. Do you want to delete them?\n\n"
-        confirmation_message += "\n".join(autochecked_files)
-        if messagebox.askyesno("Confirm Deletion", confirmation_message):
-            auto_delete_selected_files()  # Delete files if confirmed
-    root.mainloop()
-
-
-
-
-# Usage:
-# popup_window([("file1.txt", 90), ("file2.txt", 80)], "path/to/current/file.txt")
-
-
-
-def watch_directory(directory, window_size):
-    event_handler = NewFileHandler(directory, window_size)
+        if self.move(event.src_path, event.dest_path):
+            return  # An indexed file was renamed; its fingerprints moved with it
+        if is_indexed(event.dest_path, self.window_size, self.mode, self.guarantee):
+            return  # Moved along with its directory, which was followed already
+        # A file renamed into place (a finished download, say) is new and already complete
+        self.readiness.expect(event.dest_path)
+        self.readiness.mark_closed(event.dest_path)
+        self.submit(event.dest_path)
+
+    def on_deleted(self, event):
+        self.forget(event.src_path)
+
+    def on_modified(self, event):
+        if event.is_directory:
+            return
+        file_path = event.src_path
+        with self.lock:
+            if file_path in self.modified:
+                return  # Already queued; it is read again once the writer is done
+        if not fingerprint_store.contains(file_path):
+            return  # New files are handled by on_created
+        with self.lock:
+            self.modified.add(file_path)
+        self.readiness.expect(file_path)
+        self.updates.submit(file_path)
+
+def watch_directory(directory, window_size, mode='rolling', guarantee=None, workers=None):
+    from gui import GuiService  # Tk is only loaded once the watcher starts, PIL with the first window
+    gui = GuiService(directory)
     observer = Observer()
+    event_handler = NewFileHandler(directory, window_size, mode=mode, guarantee=guarantee, workers=workers,
+                                   close_events=close_events_supported(observer), gui=gui)
+    gui.on_delete = event_handler.forget  # Files deleted from a result window leave the index at once
+    event_handler.pipeline.start()
+    event_handler.updates.start()
+    # Watch before reconciling, so files created while the tree is walked are not missed
     observer.schedule(event_handler, directory, recursive=True)
     observer.start()
+
+    def reconcile():
+        # Off the main thread, so result windows open while a large tree is still being indexed
+        try:
+            missed = index_directory(directory, window_size, mode, guarantee, pool=event_handler.pool)
+        except Exception as e:  # The pool is shut down when the watcher quits mid-scan
+            print(f"Indexing stopped: {e}")
+            return
+        event_handler.catch_up(missed)
+
+    def report_status():
+        # Report queue depths while work is in flight, so backlogs are visible
+        if event_handler.pipeline.busy() or event_handler.updates.busy():
+            print(f"Pipeline: {event_handler.pipeline.status()}")
+            print(f"Updates: {event_handler.updates.status()}")
+            print("Text cache: {entries} files, {bytes}/{max_bytes} bytes, {hits} hits, {misses} misses "
+                  "({stale} stale), {evictions} evictions".format(**text_cache.stats()))
+
     try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
+        threading.Thread(target=reconcile, daemon=True).start()
+        gui.every(STATUS_INTERVAL * 1000, report_status)
+        gui.run()  # Tk needs the main thread; watching and comparing happen on worker threads
+    finally:
         observer.stop()
-    observer.join()
+        observer.join()
+        event_handler.pipeline.stop()
+        event_handler.updates.stop()
+        event_handler.pool.shutdown()
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python script.py /path/to/directory window_size")
-        sys.exit(1)
-
-    directory = sys.argv[1]
-    window_size = int(sys.argv[2])
+    parser = argparse.ArgumentParser(description="Watch a directory and offer to delete files similar to new ones.")
+    parser.add_argument('directory', help="directory to watch")
+    parser.add_argument('window_size', type=parse_window_sizes,
+                        help="characters per window, e.g. 10, 5,10,20 or 5-20 to fingerprint several sizes at once "
+                             "(words per window in tokens mode, words per shingle in minhash mode)")
+    parser.add_argument('mode', nargs='?', default='rolling', choices=['rolling', 'tokens', 'minhash'])
+    parser.add_argument('--winnow', type=int, metavar='T', dest='guarantee',
+                        help="rolling and tokens modes: keep only winnowed fingerprints; matches of at least T characters "
+                             "(words in tokens mode) are always found")
+    parser.add_argument('--text-cache-mb', type=int, default=TEXT_CACHE_BYTES // (1024 * 1024),
+                        help="memory for cached document text, in MiB (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes used to extract PDF, DOCX and other documents (default: one per CPU)")
+    parser.add_argument('--index', action='store_true',
+                        help="fingerprint every supported file in the tree, then exit instead of watching; "
+                             "an interrupted run resumes where it stopped")
+    args = parser.parse_args()
+
+    directory = args.directory
+    text_cache.max_bytes = args.text_cache_mb * 1024 * 1024
+    window_size = args.window_size if len(args.window_size) > 1 else args.window_size[0]
 
     if not os.path.isdir(directory):
         print(f"Error: {directory} is not a directory.")
         sys.exit(1)
-    watch_directory(directory, window_size)
+    if args.mode == 'minhash' and len(args.window_size) > 1:
+        parser.error("minhash mode takes a single shingle size")
+    if args.guarantee is not None and args.guarantee < max(args.window_size):
+        parser.error("--winnow must be at least the largest window size")
+    if args.index:
+        try:
+            index_directory(directory, window_size, args.mode, args.guarantee, args.workers)
+        except KeyboardInterrupt:
+            sys.exit(130)
+    else:
+        watch_directory(directory, window_size, args.mode, args.guarantee, args.workers)
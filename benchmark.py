@@ -0,0 +1,260 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fingerprint import rolling_hash, fingerprint_set, jaccard
+from extraction import TextNormalizer, nltk_resources
+from walker import walk_files
+
+
+def legacy_rolling_hash(text, window_size):
+    """
+    The original character-by-character rolling_hash, kept as the baseline.
+    """
+    hash_values = []
+    text_len = len(text)
+    prime = 101  # Choose a prime number
+    modulus = 2**32  # Typically a large prime number
+    hash_value = 0
+    for i in range(window_size):
+        hash_value = (hash_value * prime + ord(text[i])) % modulus
+    hash_values.append(hash_value)
+
+    for i in range(1, text_len - window_size + 1):
+        hash_value = (hash_value * prime - ord(text[i - 1]) * pow(prime, window_size, modulus) + ord(text[i + window_size - 1])) % modulus
+        hash_values.append(hash_value)
+    return hash_values
+
+
+def legacy_preprocess_text(text):
+    """
+    The original regex + word_tokenize + list comprehension preprocess_text.
+    """
+    from nltk.tokenize import word_tokenize
+    stop_words, lemmatizer = nltk_resources()
+    text = re.sub(r'[^A-Za-z0-9\s]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = text.lower()
+    words = word_tokenize(text)
+    words = [word for word in words if word not in stop_words]
+    words = [lemmatizer.lemmatize(word) for word in words]
+    return ' '.join(words)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_rolling_hash(file_path, window_size=10):
+    """
+    Compare the NumPy rolling_hash engine against the original loop on one file.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    print(f"rolling_hash on {file_path} ({len(text)} chars, window {window_size})")
+    legacy, legacy_time = timed(legacy_rolling_hash, text, window_size)
+    vectorized, vectorized_time = timed(rolling_hash, text, window_size)
+    if vectorized.tolist() != legacy:
+        print("ERROR: vectorized hashes differ from the original loop")
+        sys.exit(1)
+    print(f"  original loop: {legacy_time:.3f}s")
+    print(f"  numpy engine:  {vectorized_time:.3f}s ({legacy_time / vectorized_time:.1f}x faster)")
+
+
+def bench_jaccard(file_path, window_size=10):
+    """
+    Compare Python sets against sorted uint64 arrays for the Jaccard step.
+
+    The file is compared with a copy of itself that has every 50th
+    character changed.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    edited = ''.join('#' if i % 50 == 0 else c for i, c in enumerate(text))
+    hash_values1 = rolling_hash(text, window_size)
+    hash_values2 = rolling_hash(edited, window_size)
+    print(f"jaccard on {file_path} ({len(text)} chars, window {window_size})")
+
+    def with_sets():
+        set1 = set(hash_values1.tolist())
+        set2 = set(hash_values2.tolist())
+        common = set1.intersection(set2)
+        return len(common) / (len(set1) + len(set2) - len(common)), set1
+
+    def with_arrays():
+        array1 = fingerprint_set(hash_values1)
+        array2 = fingerprint_set(hash_values2)
+        return jaccard(array1, array2), array1
+
+    (set_result, set1), set_time = timed(with_sets)
+    (array_result, array1), array_time = timed(with_arrays)
+    if abs(set_result - array_result) > 1e-12:
+        print("ERROR: sorted array Jaccard differs from the set version")
+        sys.exit(1)
+    set_bytes = sys.getsizeof(set1) + sum(sys.getsizeof(h) for h in set1)
+    print(f"  python sets:   {set_time:.3f}s, {set_bytes / 2**20:.1f} MiB per fingerprint set")
+    print(f"  sorted arrays: {array_time:.3f}s, {array1.nbytes / 2**20:.1f} MiB per fingerprint set "
+          f"({set_time / array_time:.1f}x faster, {set_bytes / array1.nbytes:.1f}x smaller)")
+
+
+def bench_normalizer(path):
+    """
+    Check TextNormalizer against the original preprocess_text and time both.
+
+    `path` is a text file, or a directory whose .txt files are all checked.
+    The normalizer is timed cold (empty memo) and warm.
+    """
+    if os.path.isdir(path):
+        file_paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.txt'))
+    else:
+        file_paths = [path]
+    texts = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            texts.append(f.read())
+    stop_words, lemmatizer = nltk_resources()
+    legacy_preprocess_text("warm up")  # Load WordNet before timing
+    normalizer = TextNormalizer(stop_words, lemmatizer.lemmatize)
+    print(f"preprocess_text on {len(texts)} files ({sum(map(len, texts))} chars)")
+    legacy, legacy_time = timed(lambda: [legacy_preprocess_text(text) for text in texts])
+    cold, cold_time = timed(lambda: [normalizer(text) for text in texts])
+    warm, warm_time = timed(lambda: [normalizer(text) for text in texts])
+    for file_path, expected, got in zip(file_paths, legacy, cold):
+        if got != expected:
+            print(f"ERROR: normalizer output differs from preprocess_text on {file_path}")
+            sys.exit(1)
+    if warm != cold:
+        print("ERROR: memoized normalizer output changed between runs")
+        sys.exit(1)
+    print(f"  original pipeline: {legacy_time:.3f}s")
+    print(f"  fused, cold memo:  {cold_time:.3f}s ({legacy_time / cold_time:.1f}x faster)")
+    print(f"  fused, warm memo:  {warm_time:.3f}s ({legacy_time / warm_time:.1f}x faster, "
+          f"{len(normalizer.words)} distinct tokens)")
+
+
+# Run in a child process: import the watcher, start it on an empty directory
+# and time how long until the first new file has been compared.
+STARTUP_PROBE = """
+import os, shutil, sys, time
+start = time.perf_counter()
+import autodeletion
+from watchdog.observers import Observer
+imported = time.perf_counter()
+directory, sample = sys.argv[1], sys.argv[2]
+observer = Observer()
+handler = autodeletion.NewFileHandler(directory, 10, workers=1, close_events=autodeletion.close_events_supported(observer))
+handler.pipeline.start()
+observer.schedule(handler, directory, recursive=True)
+observer.start()
+watching = time.perf_counter()
+shutil.copy(sample, os.path.join(directory, 'first.txt'))
+compare = handler.pipeline.stages[-2]
+while compare.processed + compare.failed == 0:
+    time.sleep(0.001)
+first_event = time.perf_counter()
+print(imported - start, watching - start, first_event - start, flush=True)
+observer.stop()
+handler.pipeline.stop()
+handler.pool.shutdown()  # Its workers would keep the captured stdout open
+os._exit(0)
+"""
+
+
+def bench_startup(file_path):
+    """
+    Measure watcher startup: import cost per module and time to the first event.
+
+    `file_path` is a plain text file dropped into an empty watched directory
+    as the first event. The child runs with HOME pointed at a scratch
+    directory so the user's fingerprint store is left alone.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    scratch = tempfile.mkdtemp()
+    try:
+        env = dict(os.environ, HOME=scratch, PYTHONPATH=here)
+        watched = os.path.join(scratch, 'watched')
+        os.makedirs(watched)
+
+        importtime = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import autodeletion'],
+                                    cwd=here, env=env, capture_output=True, text=True)
+        modules = []
+        for line in importtime.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            name = fields[2]
+            depth = (len(name) - len(name.lstrip()) - 1) // 2  # Nested imports are indented two spaces per level
+            if depth == 0:
+                if name.strip() == 'autodeletion':
+                    break
+                modules = []  # Children are listed before their parent; these belonged to another module
+            elif depth == 1:
+                modules.append((int(fields[1]), name.strip()))
+        modules.sort(reverse=True)
+        print("slowest imports made by autodeletion (cumulative):")
+        for cumulative, name in modules[:10]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        wall_start = time.perf_counter()
+        probe = subprocess.run([sys.executable, '-c', STARTUP_PROBE, watched, os.path.abspath(file_path)],
+                               cwd=here, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - wall_start
+        if probe.returncode != 0:
+            print(probe.stderr)
+            sys.exit(1)
+        imported, watching, first_event = (float(value) for value in probe.stdout.split()[-3:])
+        print(f"import autodeletion:   {imported:.3f}s")
+        print(f"watching:              {watching:.3f}s")
+        print(f"first event compared:  {first_event:.3f}s ({wall:.3f}s including interpreter start, "
+              f"and the compare stage's batching window)")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def legacy_walk(directory, extensions):
+    """
+    os.walk plus a separate isfile/getsize per file, as a baseline for walk_files.
+    """
+    found = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() in extensions and os.path.isfile(path):
+                found.append((path, os.path.getsize(path)))
+    return found
+
+
+def bench_walk(directory, workers=8):
+    """
+    Time walking a directory tree with os.walk and with walk_files.
+    """
+    extensions = ('.txt', '.pdf', '.doc', '.docx', '.rtf', '.html', '.htm', '.odt')
+    legacy, legacy_time = timed(legacy_walk, directory, extensions)
+    walked, walk_time = timed(lambda: list(walk_files(directory, extensions, workers=workers)))
+    if sorted(legacy) != sorted((path, st.st_size) for path, st in walked):
+        print("ERROR: walk_files and os.walk found different files")
+        sys.exit(1)
+    print(f"{len(walked)} supported files under {directory}")
+    print(f"  os.walk + getsize:      {legacy_time:.3f}s")
+    print(f"  walk_files ({workers} workers): {walk_time:.3f}s ({legacy_time / walk_time:.1f}x faster)")
+
+
+BENCHMARKS = {
+    'rolling_hash': bench_rolling_hash,
+    'jaccard': bench_jaccard,
+    'normalizer': bench_normalizer,
+    'startup': bench_startup,
+    'walk': bench_walk,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py {{{'|'.join(BENCHMARKS)}}} /path/to/file [args...]")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](sys.argv[2], *(int(arg) for arg in sys.argv[3:]))
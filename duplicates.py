@@ -0,0 +1,136 @@
+import hashlib
+import os
+
+import numpy as np
+
+EDGE_SIZE = 64 * 1024  # Bytes hashed from each end of the file in the second tier
+CHUNK_SIZE = 1024 * 1024
+BLOCK_SIZE = 1024 * 1024  # Bytes per digest in BlockDigests
+
+
+def edge_digest(path, size=None):
+    """
+    Hash the first and last 64 KiB of a file (all of it when it is smaller).
+
+    With `size` only the first `size` bytes count as the file, so the
+    digest of a file before it was appended to can be checked again.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        digest.update(f.read(min(size, EDGE_SIZE)))
+        if size > EDGE_SIZE:
+            position = max(size - EDGE_SIZE, EDGE_SIZE)
+            f.seek(position)
+            digest.update(f.read(size - position))
+    return np.frombuffer(digest.digest(), dtype=np.uint32)
+
+
+class BlockDigests:
+    """
+    Hash a stream of bytes in BLOCK_SIZE blocks, one digest per block.
+
+    Unlike a single digest, the digests of a prefix of the stream stay
+    valid when more bytes are added, and a changed block is found as soon
+    as it is read (see resume_block_digests).
+    """
+
+    def __init__(self):
+        self.digests = []  # Digests of the full blocks
+        self.block = hashlib.blake2b(digest_size=16)
+        self.filled = 0  # Bytes in the current, unfinished block
+        self.size = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while len(view):
+            count = min(BLOCK_SIZE - self.filled, len(view))
+            self.block.update(view[:count])
+            self.filled += count
+            self.size += count
+            view = view[count:]
+            if self.filled == BLOCK_SIZE:
+                self.digests.append(self.block.digest())
+                self.block = hashlib.blake2b(digest_size=16)
+                self.filled = 0
+
+    def last(self):
+        return self.block.digest() if self.filled else self.digests[-1]
+
+    def result(self):
+        """
+        Return the digests of every block so far, the last one possibly short, as a uint32 array.
+        """
+        digests = self.digests + [self.block.digest()] if self.filled else self.digests
+        return np.frombuffer(b''.join(digests), dtype=np.uint32)
+
+
+def resume_block_digests(path, size, expected):
+    """
+    Check the first `size` bytes of a file against the BlockDigests result `expected`.
+
+    Every byte is read and hashed again, but nothing more is done with it.
+    Returns the BlockDigests fed with those bytes, ready to take what was
+    appended after them, or None as soon as a block no longer matches.
+    """
+    expected = np.ascontiguousarray(expected, dtype=np.uint32).tobytes()
+    if size <= 0 or len(expected) != -(-size // BLOCK_SIZE) * 16:
+        return None
+    digests = BlockDigests()
+    with open(path, 'rb') as f:
+        for block, position in enumerate(range(0, size, BLOCK_SIZE)):
+            data = f.read(min(BLOCK_SIZE, size - position))
+            digests.update(data)
+            if digests.size < min(position + BLOCK_SIZE, size) or digests.last() != expected[16 * block:16 * block + 16]:
+                return None
+    return digests
+
+
+def content_digest(path):
+    """
+    Hash the full contents of a file in fixed-size chunks.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return np.frombuffer(digest.digest(), dtype=np.uint32)
+
+
+def _digest(path, scheme, compute, store):
+    if store is None:
+        return compute(path)
+    return store.get_signature(path, scheme, lambda: compute(path))
+
+
+def find_exact_duplicates(file_path, candidates, store=None):
+    """
+    Return the candidates that are byte-identical to file_path.
+
+    Files are narrowed down in tiers: same size, then same hash of the first
+    and last 64 KiB, and only then the same full content hash, so most
+    candidates are rejected without reading them in full. Digests are kept in
+    `store` (a FingerprintStore) when one is given, so unchanged files are
+    never read twice.
+    """
+    size = os.path.getsize(file_path)
+    same_size = []
+    for candidate in candidates:
+        try:
+            if os.path.getsize(candidate) == size and not os.path.samefile(candidate, file_path):
+                same_size.append(candidate)
+        except OSError:  # Candidate vanished since it was indexed
+            pass
+    if not same_size:
+        return []
+
+    edge = _digest(file_path, 'edge', edge_digest, store)
+    same_edges = [c for c in same_size if np.array_equal(_digest(c, 'edge', edge_digest, store), edge)]
+    if not same_edges:
+        return []
+    if size <= 2 * EDGE_SIZE:  # The edge digest already covered every byte
+        return same_edges
+
+    content = _digest(file_path, 'content', content_digest, store)
+    return [c for c in same_edges if np.array_equal(_digest(c, 'content', content_digest, store), content)]
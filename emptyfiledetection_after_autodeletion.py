@@ -14,6 +14,7 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import PorterStemmer
 from nltk.stem import WordNetLemmatizer
+from fingerprint import rolling_hash, fingerprint_set, jaccard
 # Initialize NLTK resources
 stop_words = set(stopwords.words('english'))
 ps = PorterStemmer()
@@ -62,30 +63,6 @@ class CheckboxTreeview(tk.Frame):
                 pass
         return checked_items
 
-def rolling_hash(text, window_size):
-    """
-    Compute rolling hash values for all windows of size `window_size`.
-    """
-    hash_values = []
-    text_len = len(text)
-    prime = 101  # Choose a prime number
-    modulus = 2**32  # Typically a large prime number
-    
-    if text_len < window_size:
-        return hash_values  # Return empty list if text length is smaller than window size
-    
-    hash_value = 0
-    for i in range(window_size):
-        hash_value = (hash_value * prime + ord(text[i])) % modulus
-    hash_values.append(hash_value)
-
-    for i in range(1, text_len - window_size + 1):
-        hash_value = (hash_value * prime - ord(text[i - 1]) * pow(prime, window_size, modulus) + ord(text[i + window_size - 1])) % modulus
-        hash_values.append(hash_value)
-
-    return hash_values
-
-
 def preprocess_text(text):
     # Remove special characters, punctuation, and extra whitespaces
     text = re.sub(r'[^A-Za-z0-9\s]', '', text)
@@ -182,15 +159,14 @@ def find_similarity(file1, file2, window_size):
         print("One or both files are empty. Cannot compute similarity.")
         return 0  # Return default similarity value or handle the situation accordingly
     
-    hash_values1 = rolling_hash(text1, window_size)
-    hash_values2 = rolling_hash(text2, window_size)
+    hash_values1 = fingerprint_set(rolling_hash(text1, window_size))
+    hash_values2 = fingerprint_set(rolling_hash(text2, window_size))
 
-    if not hash_values1 or not hash_values2:
+    if len(hash_values1) == 0 or len(hash_values2) == 0:
         print("One or both hash values lists are empty. Cannot compute similarity.")
         return 0  # Return default similarity value or handle the situation accordingly
 
-    common_hashes = set(hash_values1).intersection(hash_values2)
-    similarity = (len(common_hashes) / (len(hash_values1) + len(hash_values2) - len(common_hashes))) * 100
+    similarity = jaccard(hash_values1, hash_values2) * 100
 
     print(f"Similarity calculation complete.")
     return similarity
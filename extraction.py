@@ -0,0 +1,342 @@
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from fingerprint import iter_text_chunks
+from extraction_cache import ExtractionCache
+
+# Last run of whitespace in a piece of text, where it can be cut safely
+LAST_WHITESPACE = re.compile(r'\s\S*\Z')
+
+# Extracted text by content hash, shared by every path, process and run
+EXTRACTION_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.file_similarity', 'extracted')
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_DIR)
+
+# Extractions allowed to run at once per format; None means no limit beyond
+# the pool size. PDF parsing and textract are the slow, memory-hungry ones.
+FORMAT_LIMITS = {'pdf': 2, 'docx': 2, 'textract': 2, 'txt': None}
+
+
+# Everything but ASCII letters, digits and whitespace is deleted before tokenizing
+NON_WORD = re.compile(r'[^A-Za-z0-9\s]+')
+
+# The contractions NLTK's word_tokenize splits that contain no apostrophe;
+# all its other rules need punctuation, which NON_WORD has already removed
+CONTRACTIONS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na'),
+}
+
+MAX_MEMOIZED_WORDS = 1 << 20  # Distinct tokens remembered by TextNormalizer
+
+
+@lru_cache(maxsize=None)
+def nltk_resources():
+    """
+    Load the stopword set and lemmatizer the first time text is preprocessed.
+
+    Importing NLTK and reading its corpora takes seconds, so a watcher that
+    only sees plain text never pays for it. PyPDF2, python-docx and textract
+    are likewise imported inside the functions that use them.
+    """
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    return set(stopwords.words('english')), WordNetLemmatizer()
+
+class TextNormalizer:
+    """
+    Turn raw text into space-separated lemmas, as preprocess_text always has.
+
+    Once punctuation is deleted, NLTK's word_tokenize is a whitespace split
+    plus a handful of contractions, so the text is cleaned, lowercased and
+    split by three C-level calls and every token then goes through a single
+    Python loop. What a token turns into (contraction split, stopwords
+    dropped, WordNet lemma) is worked out once per distinct token and
+    memoized, so repeated words cost one dict lookup.
+    """
+
+    def __init__(self, stop_words, lemmatize, max_words=MAX_MEMOIZED_WORDS):
+        self.stop_words = stop_words
+        self.lemmatize = lemmatize
+        self.max_words = max_words
+        self.words = {}  # token -> normalized words, '' if all of it is dropped
+
+    def normalize_word(self, token):
+        parts = CONTRACTIONS.get(token, (token,))
+        return ' '.join(self.lemmatize(part) for part in parts if part not in self.stop_words)
+
+    def __call__(self, text):
+        words = self.words
+        normalized = []
+        for token in NON_WORD.sub('', text).lower().split():
+            word = words.get(token)
+            if word is None:
+                if len(words) >= self.max_words:
+                    words.clear()
+                word = words[token] = self.normalize_word(token)
+            if word:
+                normalized.append(word)
+        return ' '.join(normalized)
+
+@lru_cache(maxsize=None)
+def text_normalizer():
+    stop_words, lemmatizer = nltk_resources()
+    return TextNormalizer(stop_words, lemmatizer.lemmatize)
+
+def preprocess_text(text):
+    """
+    Remove punctuation, lowercase, tokenize, drop stopwords and lemmatize.
+    """
+    return text_normalizer()(text)
+
+def iter_preprocessed_text(text_chunks):
+    """
+    Preprocess text that arrives in pieces, matching preprocess_text on the whole.
+
+    Each piece is cut after its last whitespace and the rest is carried over,
+    so no word is ever split between two calls to preprocess_text.
+    """
+    pending = ''
+    first = True
+    for chunk in text_chunks:
+        pending += chunk
+        match = LAST_WHITESPACE.search(pending)
+        if match is None:
+            continue
+        words = preprocess_text(pending[:match.start()])
+        pending = pending[match.start():]
+        if words:
+            yield words if first else ' ' + words
+            first = False
+    words = preprocess_text(pending)
+    if words:
+        yield words if first else ' ' + words
+
+def iter_pdf_pages(pdf_path):
+    from PyPDF2 import PdfReader
+    print(f"Reading PDF: {pdf_path}")
+    with open(pdf_path, 'rb') as f:
+        reader = PdfReader(f)
+        total_pages = len(reader.pages)
+        for i, page in enumerate(reader.pages, 1):
+            print(f"Processing page {i}/{total_pages}")
+            yield page.extract_text()
+        print("PDF reading complete.")
+
+def extract_text_from_pdf(pdf_path):
+    text = ''.join(iter_pdf_pages(pdf_path))
+    # Preprocess the extracted text
+    preprocessed_text = preprocess_text(text)
+    return preprocessed_text
+def extract_text_from_docx(docx_path):
+    try:
+        from docx import Document
+        doc = Document(docx_path)
+        text = ''.join(paragraph.text for paragraph in doc.paragraphs)
+
+        # Preprocess the extracted text
+        preprocessed_text = preprocess_text(text)
+        print(preprocessed_text)
+        return preprocessed_text
+    except Exception as e:
+        print(f"Error extracting text from {docx_path}: {e}")
+        return None
+def extract_text_from_file(file_path):
+    """
+    Extract text content from a supported file format.
+
+    PDF, DOCX and textract results come from the extraction cache when a
+    file with the same bytes was extracted before, under any name.
+    """
+    fmt = extraction_format(file_path)
+    if fmt == 'txt':
+        return _extract_text_from_file(file_path)
+    key = extraction_cache.key(file_path, fmt)
+    text = extraction_cache.load(key)
+    if text is None:
+        text = _extract_text_from_file(file_path)
+        if text:  # The extractors return None or "" on errors
+            extraction_cache.store(key, text)
+    return text
+
+def _extract_text_from_file(file_path):
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == '.pdf':
+        # Extract text from PDF
+        return extract_text_from_pdf(file_path)
+    elif file_extension == '.txt':
+        # Read text from plain text file
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
+    elif file_extension in ['.doc','.docx']:
+        text2 = extract_text_from_docx(file_path)
+        print(text2)
+        return text2
+    elif file_extension in ['.rtf', '.html', '.htm', '.odt']:
+        # Extract text from other supported formats using textract
+        try:
+            import textract
+            text = textract.process(file_path, encoding='utf-8').decode('utf-8')
+            return text
+        except Exception as e:
+            print(f"Error extracting text from {file_path}: {e}")
+            return ""
+    else:
+        print(f"Unsupported file format: {file_extension}")
+        return ""
+
+def iter_extracted_text(file_path):
+    """
+    Yield the text extract_text_from_file would return, one piece at a time.
+
+    Plain text is read in fixed-size chunks and PDF/DOCX text page by page or
+    paragraph by paragraph, so large files are never held in memory whole.
+    textract only returns complete documents and is passed through as is.
+    PDF and DOCX text is written to the extraction cache as it streams past,
+    and streamed back from there for any file with the same content.
+    """
+    if os.path.splitext(file_path)[1].lower() == '.txt':
+        yield from iter_text_chunks(file_path)
+        return
+    fmt = extraction_format(file_path)
+    if fmt not in ('pdf', 'docx'):
+        yield extract_text_from_file(file_path)
+        return
+    key = extraction_cache.key(file_path, fmt)
+    cached = extraction_cache.iter_load(key)
+    if cached is not None:
+        yield from cached
+        return
+    if fmt == 'pdf':
+        pieces = iter_preprocessed_text(iter_pdf_pages(file_path))
+    else:
+        try:
+            from docx import Document
+            doc = Document(file_path)
+        except Exception as e:
+            print(f"Error extracting text from {file_path}: {e}")
+            return
+        pieces = iter_preprocessed_text(paragraph.text for paragraph in doc.paragraphs)
+    # Cache the text as it streams past; the entry is only kept if extraction finishes
+    writer = extraction_cache.writer(key)
+    try:
+        for piece in pieces:
+            writer.write(piece)
+            yield piece
+    except BaseException:
+        writer.discard()
+        raise
+    writer.commit()
+
+
+def extraction_format(file_path):
+    """
+    Return the extractor a file goes through: 'pdf', 'docx', 'textract' or 'txt'.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension == '.pdf':
+        return 'pdf'
+    if file_extension in ['.doc', '.docx']:
+        return 'docx'
+    if file_extension in ['.rtf', '.html', '.htm', '.odt']:
+        return 'textract'
+    return 'txt'
+
+class ExtractionPool:
+    """
+    Extract text in worker processes, with a concurrency limit per format.
+
+    A burst of PDFs cannot take every worker, so plain text and DOCX files
+    keep moving while the slow parses run. The limits hold across `run`
+    and `submit_many` calls, so bulk indexing and new files share them.
+    """
+
+    def __init__(self, max_workers=None, format_limits=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(self.max_workers)
+        self.format_limits = dict(FORMAT_LIMITS if format_limits is None else format_limits)
+        self.slots = {fmt: threading.BoundedSemaphore(limit) for fmt, limit in self.format_limits.items() if limit}
+        # Fork the workers now, before the caller starts the observer and pipeline threads
+        self.executor.submit(os.getpid).result()
+
+    def _acquire(self, fmt, blocking=True):
+        slot = self.slots.get(fmt)
+        return slot is None or slot.acquire(blocking)
+
+    def _release(self, fmt):
+        slot = self.slots.get(fmt)
+        if slot is not None:
+            slot.release()
+
+    def run(self, task, file_path, *args):
+        """
+        Run `task(file_path, *args)` in the pool, first waiting for a free slot for the file's format.
+        """
+        fmt = extraction_format(file_path)
+        self._acquire(fmt)
+        try:
+            return self.executor.submit(task, file_path, *args).result()
+        finally:
+            self._release(fmt)
+
+    def submit_many(self, task, file_paths, *args):
+        """
+        Run `task(file_path, *args)` for many files, yielding (finish_order, file_path, future) as each completes.
+
+        finish_order counts from 1 in the order the results came back, which
+        is generally not the order the files were given in. `file_paths` is
+        read lazily, a few files per worker ahead, so it can be a walk of a
+        whole tree. Closing the generator cancels what has not started.
+        """
+        file_paths = iter(file_paths)
+        queued = {}  # format -> paths waiting for a slot
+        running = {}  # future -> (file_path, format)
+        backlog = 2 * self.max_workers  # Keep every worker busy without queueing the whole tree
+        exhausted = False
+
+        def submit(file_path, fmt):
+            running[self.executor.submit(task, file_path, *args)] = (file_path, fmt)
+
+        def submit_ready():
+            nonlocal exhausted
+            while not exhausted and len(running) + sum(len(queue) for queue in queued.values()) < backlog:
+                file_path = next(file_paths, None)
+                if file_path is None:
+                    exhausted = True
+                else:
+                    queued.setdefault(extraction_format(file_path), deque()).append(file_path)
+            for fmt, queue in queued.items():
+                while queue and self._acquire(fmt, blocking=False):
+                    submit(queue.popleft(), fmt)
+            if not running:  # What is left waits for slots held by `run` calls
+                for fmt, queue in queued.items():
+                    if queue:
+                        self._acquire(fmt)
+                        submit(queue.popleft(), fmt)
+                        break
+
+        finish_order = 0
+        try:
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path, fmt = running.pop(future)
+                    self._release(fmt)
+                    finish_order += 1
+                    yield finish_order, file_path, future
+                submit_ready()
+        finally:
+            for future, (_, fmt) in running.items():
+                future.cancel()
+                future.add_done_callback(lambda _, fmt=fmt: self._release(fmt))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
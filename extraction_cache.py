@@ -0,0 +1,96 @@
+import gzip
+import os
+import threading
+
+from duplicates import content_digest
+
+# Bump a format's version whenever its extractor or preprocess_text changes
+# output, so text cached by the old code is never served again.
+EXTRACTOR_VERSIONS = {'pdf': 1, 'docx': 1, 'textract': 1}
+READ_CHARS = 1 << 22  # Characters per piece when streaming cached text back
+
+
+class CacheWriter:
+    """
+    Write one cache entry piece by piece; it only becomes visible on commit().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+
+    def write(self, text):
+        self.file.write(text)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)  # Atomic, so readers never see half an entry
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted text, addressed by file content.
+
+    Entries are keyed by a hash of the file's bytes plus the extractor and
+    its version, not by path, so a renamed, moved or copied document is
+    recognised and never parsed twice, across restarts and across the
+    worker processes of an ExtractionPool. Text is stored gzip-compressed,
+    one file per entry, written to a temporary name and renamed into place.
+    """
+
+    def __init__(self, directory, versions=EXTRACTOR_VERSIONS):
+        self.directory = directory
+        self.versions = versions
+
+    def key(self, file_path, fmt):
+        digest = content_digest(file_path).tobytes().hex()
+        return f"{digest}-{fmt}-v{self.versions[fmt]}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.txt.gz')
+
+    def load(self, key):
+        """
+        Return the cached text for `key`, or None if nothing is cached.
+        """
+        try:
+            with gzip.open(self._path(key), 'rt', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def iter_load(self, key, chunk_size=READ_CHARS):
+        """
+        Return an iterator over the cached text in pieces, or None if nothing is cached.
+        """
+        try:
+            f = gzip.open(self._path(key), 'rt', encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+        def pieces():
+            with f:
+                for chunk in iter(lambda: f.read(chunk_size), ''):
+                    yield chunk
+        return pieces()
+
+    def store(self, key, text):
+        writer = self.writer(key)
+        try:
+            writer.write(text)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.commit()
+
+    def writer(self, key):
+        return CacheWriter(self._path(key))
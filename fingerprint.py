@@ -0,0 +1,344 @@
+import codecs
+import io
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PRIME = 101  # Same base as the original rolling_hash loop
+MODULUS = 2**32  # uint32 arithmetic wraps at exactly this modulus
+PRIME_INVERSE = pow(PRIME, -1, MODULUS)  # PRIME is odd, so it is invertible mod 2**32
+BLOCK_SIZE = 1 << 22  # Windows hashed per block, bounds the temporary arrays
+CHUNK_CHARS = 1 << 22  # Characters read per chunk when streaming a file
+
+
+def encode_text(text):
+    """
+    Encode text once into a uint8 (pure ASCII) or uint32 array of code points.
+    """
+    if text.isascii():
+        return np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+def _powers(base, count):
+    """
+    Return base**0 .. base**(count - 1) modulo 2**32 as a uint32 array.
+    """
+    powers = np.full(count, base, dtype=np.uint32)
+    powers[0] = 1
+    return np.cumprod(powers, dtype=np.uint32)
+
+
+def _hash_block(codes, window_sizes):
+    """
+    Hash every window of `codes`, for each window size, with prefix-hash arithmetic.
+
+    With S[k] = sum(codes[j] * PRIME**-j for j < k) the window of size w
+    starting at i hashes to PRIME**(i + w - 1) * (S[i + w] - S[i]), which is
+    exactly the value the character-by-character loop produces. S and the
+    powers are computed once and shared by all window sizes.
+    """
+    length = len(codes)
+    prefix = np.zeros(length + 1, dtype=np.uint32)
+    np.cumsum(codes.astype(np.uint32) * _powers(PRIME_INVERSE, length), dtype=np.uint32, out=prefix[1:])
+    powers = _powers(PRIME, length)
+    block = {}
+    for window_size in window_sizes:
+        window_sums = prefix[window_size:] - prefix[:max(length - window_size + 1, 0)]
+        window_sums *= powers[window_size - 1:]
+        block[window_size] = window_sums
+    return block
+
+
+def _check_window_sizes(window_sizes):
+    window_sizes = sorted(set(window_sizes))
+    if not window_sizes or window_sizes[0] < 1:
+        raise ValueError(f"window sizes must be positive, got {window_sizes}")
+    return window_sizes
+
+
+def rolling_hashes(text, window_sizes):
+    """
+    Compute rolling hash values for several window sizes in one pass.
+
+    Returns a dict mapping each window size to the uint64 array that
+    `rolling_hash` would return for it.
+    """
+    window_sizes = _check_window_sizes(window_sizes)
+    codes = encode_text(text) if isinstance(text, str) else np.asarray(text)
+    hash_values = {w: np.empty(max(len(codes) - w + 1, 0), dtype=np.uint64) for w in window_sizes}
+    window_count = len(codes) - window_sizes[0] + 1  # The smallest window has the most positions
+    for start in range(0, window_count, BLOCK_SIZE):
+        block = _hash_block(codes[start:start + BLOCK_SIZE + window_sizes[-1] - 1], window_sizes)
+        for window_size in window_sizes:
+            stop = min(start + BLOCK_SIZE, len(codes) - window_size + 1)
+            if stop > start:
+                hash_values[window_size][start:stop] = block[window_size][:stop - start]
+    return hash_values
+
+
+def rolling_hash(text, window_size):
+    """
+    Compute rolling hash values for all windows of size `window_size`.
+
+    `text` may be a string or an array already produced by `encode_text`.
+    Returns a uint64 array with the same values, in the same order, as the
+    original pure Python implementation; texts shorter than the window
+    produce an empty array.
+    """
+    return rolling_hashes(text, [window_size])[window_size]
+
+
+def mix_ids(ids):
+    """
+    Scramble integer ids into well-spread uint32 codes (MurmurHash3's finalizer).
+
+    Consecutive token ids make poor digits for the polynomial hash, since
+    nearby windows would collide; the mix is a bijection, so distinct ids
+    stay distinct.
+    """
+    codes = np.array(ids, dtype=np.uint32)
+    codes ^= codes >> 16
+    codes *= np.uint32(0x85EBCA6B)
+    codes ^= codes >> 13
+    codes *= np.uint32(0xC2B2AE35)
+    codes ^= codes >> 16
+    return codes
+
+
+def fingerprint_set(hash_values):
+    """
+    Return hash values as a sorted, deduplicated uint64 array.
+
+    Sorts and drops repeats directly; np.unique is several times slower on
+    large uint64 inputs.
+    """
+    hash_values = np.sort(np.asarray(hash_values, dtype=np.uint64))
+    if len(hash_values) > 1:
+        keep = np.empty(len(hash_values), dtype=bool)
+        keep[0] = True
+        np.not_equal(hash_values[1:], hash_values[:-1], out=keep[1:])
+        hash_values = hash_values[keep]
+    return hash_values
+
+
+def intersection_size(set1, set2):
+    """
+    Count the values two fingerprint sets (see `fingerprint_set`) have in common.
+
+    Each value of the smaller set is located in the larger one by binary
+    search, so nothing the size of the union is ever allocated.
+    """
+    small, large = (set1, set2) if len(set1) <= len(set2) else (set2, set1)
+    if len(small) == 0:
+        return 0
+    positions = np.searchsorted(large, small)
+    positions[positions == len(large)] = 0  # Past the end: compare against any value, it cannot match
+    return int(np.count_nonzero(large[positions] == small))
+
+
+def jaccard(set1, set2):
+    """
+    Jaccard similarity of two fingerprint sets; 0 when both are empty.
+    """
+    shared = intersection_size(set1, set2)
+    union = len(set1) + len(set2) - shared
+    return shared / union if union else 0.0
+
+
+def winnow_window(window_size, guarantee):
+    """
+    Return the winnowing window that detects every match of `guarantee` characters.
+
+    A shared substring of t characters contains t - k + 1 hashes of k-grams,
+    so winnowing with w = t - k + 1 is certain to select one of them.
+    """
+    if guarantee < window_size:
+        raise ValueError(f"guarantee ({guarantee}) must be at least the window size ({window_size})")
+    return guarantee - window_size + 1
+
+
+def _winnow_positions(hash_values, window):
+    """
+    Return the position of the rightmost minimum of every window of hashes.
+    """
+    window_count = len(hash_values) - window + 1
+    positions = [np.empty(0, dtype=np.intp)]
+    for start in range(0, window_count, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, window_count)
+        windows = sliding_window_view(hash_values[start:stop + window - 1], window)
+        rightmost = window - 1 - np.argmin(windows[:, ::-1], axis=1)
+        positions.append(start + np.arange(stop - start) + rightmost)
+    return np.concatenate(positions)
+
+
+def _first_occurrences(positions, previous=-1):
+    """
+    Mask positions equal to the one before them; they only ever move right.
+    """
+    keep = np.empty(len(positions), dtype=bool)
+    if len(positions):
+        keep[0] = positions[0] != previous
+        keep[1:] = positions[1:] != positions[:-1]
+    return keep
+
+
+def winnow(hash_values, window):
+    """
+    Select fingerprints by winnowing, as in MOSS.
+
+    Keeps the rightmost minimum of every `window` consecutive hashes and
+    records each selected position once, which leaves about
+    2 / (window + 1) of the hashes.
+    """
+    hash_values = np.asarray(hash_values)
+    window = min(window, len(hash_values))  # A short text still yields its minimum
+    if window <= 1:
+        return hash_values.copy()
+    positions = _winnow_positions(hash_values, window)
+    return hash_values[positions[_first_occurrences(positions)]]
+
+
+def iter_text_chunks(path, chunk_size=CHUNK_CHARS):
+    """
+    Yield the text of a UTF-8 file `chunk_size` characters at a time.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            yield chunk
+
+
+def iter_text_range(path, start=0, end=None, chunk_size=CHUNK_CHARS, digests=None):
+    """
+    Yield the text of bytes `start` to `end` of a UTF-8 file, in pieces.
+
+    Bytes are decoded and newlines translated exactly as iter_text_chunks
+    does, so the text of a whole file is the same, but reading stops at
+    `end` even if the file keeps growing. `start` must be a character
+    boundary. The raw bytes are also passed to `digests.update` if given.
+    """
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = float('inf') if end is None else end - start
+        while remaining > 0:
+            data = f.read(int(min(chunk_size, remaining)))
+            if not data:
+                break
+            remaining -= len(data)
+            if digests is not None:
+                digests.update(data)
+            text = decoder.decode(data)
+            if text:
+                yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_rolling_hashes(text_chunks, window_sizes, carry=None):
+    """
+    Yield the rolling hashes of a text that arrives in pieces, for several window sizes.
+
+    Each step yields a dict of window size -> new hashes. The last
+    max(window_sizes) - 1 characters of each piece are carried into the next
+    one, so for every window size the concatenated output equals
+    rolling_hash on the whole text while only one piece is held in memory.
+
+    To continue a text hashed earlier, pass the codes of its last
+    max(window_sizes) - 1 characters (all of them if it was shorter) as
+    `carry`; only windows ending after them are yielded.
+    """
+    window_sizes = _check_window_sizes(window_sizes)
+    carry = np.empty(0, dtype=np.uint8) if carry is None else np.asarray(carry)
+    for chunk in text_chunks:
+        codes = encode_text(chunk) if isinstance(chunk, str) else np.asarray(chunk)
+        codes = np.concatenate([carry, codes]) if len(carry) else codes
+        hash_values = rolling_hashes(codes, window_sizes)
+        # Windows ending inside the carried characters were yielded last time
+        yield {w: hash_values[w][max(len(carry) - (w - 1), 0):] for w in window_sizes}
+        carry = codes[max(len(codes) - (window_sizes[-1] - 1), 0):]
+
+
+class Winnower:
+    """
+    Winnow hashes that arrive in pieces, giving the same output as `winnow`.
+
+    The last window - 1 hashes and the last selected position are carried
+    from one piece to the next.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.carry = np.empty(0, dtype=np.uint64)
+        self.offset = 0  # Position of carry[0] in the whole hash sequence
+        self.previous = -1  # Last selected position
+
+    def state(self):
+        """
+        Return (carry, offset, previous), enough to continue the sequence later with `restore`.
+        """
+        return self.carry, self.offset, self.previous
+
+    def restore(self, carry, offset, previous):
+        self.carry = np.asarray(carry, dtype=np.uint64)
+        self.offset = offset
+        self.previous = previous
+
+    def feed(self, chunk):
+        """
+        Return the fingerprints selected from the windows completed by `chunk`.
+        """
+        if self.window <= 1:
+            return chunk
+        hash_values = np.concatenate([self.carry, chunk])
+        if len(hash_values) < self.window:
+            self.carry = hash_values
+            return hash_values[:0]
+        positions = _winnow_positions(hash_values, self.window)
+        keep = _first_occurrences(positions, self.previous - self.offset)
+        self.previous = self.offset + positions[-1]
+        drop = len(hash_values) - (self.window - 1)
+        self.carry = hash_values[drop:]
+        self.offset += drop
+        return hash_values[positions[keep]]
+
+    def finish(self):
+        """
+        Return what is left to select once the last piece has been fed.
+        """
+        if self.previous < 0 and len(self.carry):  # The whole sequence was shorter than one window
+            return winnow(self.carry, self.window)
+        return self.carry[:0]
+
+
+class HashSet:
+    """
+    Collect hashes arriving in pieces into one sorted, deduplicated uint64 array.
+
+    Pieces are deduplicated as they arrive and merged once they outgrow the
+    result, so memory follows the number of distinct hashes, not the text.
+    """
+
+    def __init__(self):
+        self.merged = np.empty(0, dtype=np.uint64)
+        self.pending = []
+        self.pending_size = 0
+
+    def add(self, chunk):
+        chunk = fingerprint_set(chunk)
+        self.pending.append(chunk)
+        self.pending_size += len(chunk)
+        if self.pending_size > len(self.merged):
+            self._merge()
+
+    def _merge(self):
+        self.merged = fingerprint_set(np.concatenate([self.merged, *self.pending]))
+        self.pending = []
+        self.pending_size = 0
+
+    def result(self):
+        if self.pending:
+            self._merge()
+        return self.merged
+
@@ -0,0 +1,533 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+SCHEMA_VERSION = 5  # Bump when the tables change; the store is a cache and is rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    scheme TEXT NOT NULL,
+    hashes BLOB NOT NULL,
+    PRIMARY KEY (file_id, scheme)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    scheme TEXT NOT NULL,
+    hash INTEGER NOT NULL,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    PRIMARY KEY (scheme, hash, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+CREATE TABLE IF NOT EXISTS tokens (
+    id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tails (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    scheme TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    codes BLOB NOT NULL,
+    carry BLOB NOT NULL,
+    winnow_offset INTEGER NOT NULL,
+    winnow_previous INTEGER NOT NULL,
+    PRIMARY KEY (file_id, scheme)
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    scheme TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    PRIMARY KEY (file_id, scheme)
+);
+CREATE TABLE IF NOT EXISTS scans (
+    directory TEXT PRIMARY KEY,
+    completed_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS failures (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+"""
+
+# Where fingerprinting of a text file stopped, so hashing can resume if it
+# only grows: the bytes hashed and their per-block digests, the codes of the
+# last window - 1 characters and the Winnower state
+Tail = namedtuple('Tail', 'size digest codes carry winnow_offset winnow_previous')
+
+
+def file_signature(path, stat_result=None):
+    """
+    Return the (size, mtime_ns, inode) triple used to decide if a file changed.
+    """
+    st = stat_result if stat_result is not None else os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _subtree(directory):
+    """
+    Return (prefix, end) such that the paths below `directory` are those with prefix <= path < end.
+    """
+    prefix = os.path.abspath(directory).rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)  # First string after every path starting with prefix
+
+
+def _to_sql_ints(hashes):
+    """
+    Reinterpret uint64 hashes as int64 so SQLite can store them as INTEGER.
+    """
+    return np.ascontiguousarray(hashes, dtype=np.uint64).view(np.int64).tolist()
+
+
+class FingerprintStore:
+    """
+    SQLite-backed store of per-file fingerprints that survives restarts.
+
+    Each file row carries the (size, mtime_ns, inode) it was fingerprinted at;
+    stored hashes are only returned while the file on disk still matches, so
+    unchanged files are never extracted or hashed twice. Every fingerprint is
+    also entered in an inverted index (hash -> posting list of file ids) so
+    `query` only touches files that actually share fingerprints. Fingerprints
+    and signatures are kept per scheme, a short name for how they were made
+    (for example 'k5' for 5-character windows), so variants live side by side.
+    """
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.lock = threading.Lock()  # Watchdog callbacks run on their own thread
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Commits still survive a crash or kill, so every saved file is a checkpoint,
+        # but WAL is only fsynced at checkpoints instead of on every commit
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript("DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS fingerprints; "
+                                    "DROP TABLE IF EXISTS signatures; DROP TABLE IF EXISTS tokens; DROP TABLE IF EXISTS tails; "
+                                    "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS scans; DROP TABLE IF EXISTS changes; "
+                                    "DROP TABLE IF EXISTS failures;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def _file_id(self, path, signature):
+        """
+        Return the id of `path`, dropping its fingerprints if the signature changed.
+        """
+        row = self.conn.execute("SELECT id, size, mtime_ns, inode FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            cursor = self.conn.execute("INSERT INTO files (path, size, mtime_ns, inode) VALUES (?, ?, ?, ?)", (path, *signature))
+            return cursor.lastrowid
+        if tuple(row[1:]) != signature:
+            self.conn.execute("DELETE FROM fingerprints WHERE file_id = ?", (row[0],))
+            self.conn.execute("DELETE FROM postings WHERE file_id = ?", (row[0],))
+            self.conn.execute("DELETE FROM signatures WHERE file_id = ?", (row[0],))
+            self.conn.execute("DELETE FROM tails WHERE file_id = ?", (row[0],))
+            self.conn.execute("UPDATE files SET size = ?, mtime_ns = ?, inode = ? WHERE id = ?", (*signature, row[0]))
+        return row[0]
+
+    def lookup(self, path, scheme, stat_result=None):
+        """
+        Return the stored fingerprints of `path`, or None if missing or stale.
+        """
+        path = os.path.abspath(path)
+        signature = file_signature(path, stat_result)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT f.size, f.mtime_ns, f.inode, p.hashes FROM files f "
+                "JOIN fingerprints p ON p.file_id = f.id "
+                "WHERE f.path = ? AND p.scheme = ?",
+                (path, scheme),
+            ).fetchone()
+        if row is None or tuple(row[:3]) != signature:
+            return None
+        return np.frombuffer(row[3], dtype=np.uint64)
+
+    def save(self, path, scheme, hashes, stat_result=None):
+        """
+        Record `hashes` as the fingerprints of `path` at its current signature.
+        """
+        self.save_many([(path, scheme, hashes, stat_result)])
+
+    def save_many(self, entries):
+        """
+        Record (path, scheme, hashes, stat_result) entries in a single transaction.
+
+        Committing many files at once is much cheaper than one commit per
+        file, and either all of the entries are stored or none.
+        """
+        with self.lock, self.conn:
+            for path, scheme, hashes, stat_result in entries:
+                path = os.path.abspath(path)
+                file_id = self._file_id(path, file_signature(path, stat_result))
+                hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO fingerprints (file_id, scheme, hashes) VALUES (?, ?, ?)",
+                    (file_id, scheme, hashes.tobytes()),
+                )
+                self.conn.execute("DELETE FROM postings WHERE file_id = ? AND scheme = ?", (file_id, scheme))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO postings (scheme, hash, file_id) VALUES (?, ?, ?)",
+                    ((scheme, h, file_id) for h in _to_sql_ints(hashes)),
+                )
+
+    def get_many(self, path, schemes, compute):
+        """
+        Return a dict of scheme -> fingerprints of `path` for several schemes.
+
+        `compute(missing)` is called once with the list of schemes that have
+        nothing stored, and must return a dict of fingerprints for them.
+        """
+        stat_result = os.stat(path)
+        fingerprints = {scheme: self.lookup(path, scheme, stat_result) for scheme in schemes}
+        missing = [scheme for scheme, hashes in fingerprints.items() if hashes is None]
+        if missing:
+            for scheme, hashes in compute(missing).items():
+                self.save(path, scheme, hashes, stat_result)
+                fingerprints[scheme] = hashes
+        return fingerprints
+
+    def extend_many(self, entries):
+        """
+        Record (path, scheme, hashes, added, stat_result) entries for files that only grew.
+
+        `hashes` is the complete new set of fingerprints and `added` the ones
+        it did not have before. Only the added ones are entered in the
+        inverted index, so the work follows the size of the append. Anything
+        else stored for the file (other schemes, signatures, digests) is
+        dropped, as it no longer matches the file.
+        """
+        entries = [(os.path.abspath(path), *rest) for path, *rest in entries]
+        with self.lock, self.conn:
+            for path, scheme, hashes, added, stat_result in entries:
+                file_id = self.conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()[0]
+                self.conn.execute("UPDATE files SET size = ?, mtime_ns = ?, inode = ? WHERE id = ?",
+                                  (*file_signature(path, stat_result), file_id))
+                schemes = [entry[1] for entry in entries if entry[0] == path]
+                placeholders = ', '.join('?' * len(schemes))
+                for table in ('fingerprints', 'postings', 'tails'):
+                    self.conn.execute(f"DELETE FROM {table} WHERE file_id = ? AND scheme NOT IN ({placeholders})",
+                                      (file_id, *schemes))
+                self.conn.execute("DELETE FROM signatures WHERE file_id = ?", (file_id,))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO fingerprints (file_id, scheme, hashes) VALUES (?, ?, ?)",
+                    (file_id, scheme, np.ascontiguousarray(hashes, dtype=np.uint64).tobytes()),
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO postings (scheme, hash, file_id) VALUES (?, ?, ?)",
+                    ((scheme, h, file_id) for h in _to_sql_ints(added)),
+                )
+
+    def save_tail(self, path, scheme, tail, stat_result=None):
+        """
+        Record where fingerprinting `path` under `scheme` stopped (a Tail).
+        """
+        path = os.path.abspath(path)
+        with self.lock, self.conn:
+            file_id = self._file_id(path, file_signature(path, stat_result))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tails (file_id, scheme, size, digest, codes, carry, winnow_offset, winnow_previous) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_id, scheme, tail.size, np.ascontiguousarray(tail.digest, dtype=np.uint32).tobytes(),
+                 np.ascontiguousarray(tail.codes, dtype=np.uint32).tobytes(),
+                 np.ascontiguousarray(tail.carry, dtype=np.uint64).tobytes(), int(tail.winnow_offset), int(tail.winnow_previous)),
+            )
+
+    def lookup_tail(self, path, scheme, stat_result=None):
+        """
+        Return (Tail, fingerprints) saved for `path` under `scheme`, or None.
+
+        Unlike `lookup` the file may have changed since; only its inode must
+        be the same. The Tail says how many bytes were hashed and gives their
+        digest, so the caller can check that the file has only grown.
+        """
+        path = os.path.abspath(path)
+        inode = file_signature(path, stat_result)[2]
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT t.size, t.digest, t.codes, t.carry, t.winnow_offset, t.winnow_previous, p.hashes FROM files f "
+                "JOIN tails t ON t.file_id = f.id AND t.scheme = ? "
+                "JOIN fingerprints p ON p.file_id = f.id AND p.scheme = ? "
+                "WHERE f.path = ? AND f.inode = ?",
+                (scheme, scheme, path, inode),
+            ).fetchone()
+        if row is None:
+            return None
+        size, digest, codes, carry, winnow_offset, winnow_previous, hashes = row
+        tail = Tail(size, np.frombuffer(digest, dtype=np.uint32), np.frombuffer(codes, dtype=np.uint32),
+                    np.frombuffer(carry, dtype=np.uint64), winnow_offset, winnow_previous)
+        return tail, np.frombuffer(hashes, dtype=np.uint64)
+
+    def query_many(self, paths, scheme):
+        """
+        Join the fingerprints of several indexed files against the whole index at once.
+
+        Returns a list of (path, other_path, other_size, shared_count,
+        other_fingerprint_count) tuples, one per pair of files sharing at
+        least one fingerprint. The posting lists are self-joined in a single
+        query instead of one query per file.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        with self.lock, self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_files (file_id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM query_files")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO query_files (file_id) SELECT id FROM files WHERE path = ?",
+                ((path,) for path in paths),
+            )
+            return self.conn.execute(
+                "SELECT q.path, f.path, f.size, COUNT(*), length(fp.hashes) / 8 FROM query_files qf "
+                "JOIN files q ON q.id = qf.file_id "
+                "JOIN postings a ON a.file_id = qf.file_id AND a.scheme = ? "
+                "JOIN postings b ON b.scheme = a.scheme AND b.hash = a.hash AND b.file_id != a.file_id "
+                "JOIN files f ON f.id = b.file_id "
+                "JOIN fingerprints fp ON fp.file_id = b.file_id AND fp.scheme = ? "
+                "GROUP BY a.file_id, b.file_id",
+                (scheme, scheme),
+            ).fetchall()
+
+    def has(self, path, scheme, stat_result=None):
+        """
+        Return True if current fingerprints or a signature are stored for `scheme`.
+        """
+        path = os.path.abspath(path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT f.size, f.mtime_ns, f.inode FROM files f WHERE f.path = ? AND ("
+                "EXISTS (SELECT 1 FROM fingerprints p WHERE p.file_id = f.id AND p.scheme = ?) OR "
+                "EXISTS (SELECT 1 FROM signatures s WHERE s.file_id = f.id AND s.scheme = ?))",
+                (path, scheme, scheme),
+            ).fetchone()
+        return row is not None and tuple(row) == file_signature(path, stat_result)
+
+    def lookup_signature(self, path, scheme, stat_result=None):
+        """
+        Return the stored MinHash signature of `path`, or None if missing or stale.
+        """
+        path = os.path.abspath(path)
+        signature = file_signature(path, stat_result)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT f.size, f.mtime_ns, f.inode, s.signature FROM files f "
+                "JOIN signatures s ON s.file_id = f.id "
+                "WHERE f.path = ? AND s.scheme = ?",
+                (path, scheme),
+            ).fetchone()
+        if row is None or tuple(row[:3]) != signature:
+            return None
+        return np.frombuffer(row[3], dtype=np.uint32)
+
+    def save_signature(self, path, scheme, minhash, stat_result=None):
+        """
+        Record the MinHash signature of `path` under `scheme`.
+        """
+        self.save_signatures([(path, scheme, minhash, stat_result)])
+
+    def save_signatures(self, entries):
+        """
+        Record (path, scheme, minhash, stat_result) entries in a single transaction.
+        """
+        with self.lock, self.conn:
+            for path, scheme, minhash, stat_result in entries:
+                path = os.path.abspath(path)
+                file_id = self._file_id(path, file_signature(path, stat_result))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO signatures (file_id, scheme, signature) VALUES (?, ?, ?)",
+                    (file_id, scheme, np.ascontiguousarray(minhash, dtype=np.uint32).tobytes()),
+                )
+
+    def get_signature(self, path, scheme, compute):
+        """
+        Return the MinHash signature of `path`, calling `compute()` only if none is stored.
+        """
+        stat_result = os.stat(path)
+        minhash = self.lookup_signature(path, scheme, stat_result)
+        if minhash is None:
+            minhash = compute()
+            self.save_signature(path, scheme, minhash, stat_result)
+        return minhash
+
+    def signatures(self, scheme):
+        """
+        Return (path, signature) for every file with a signature under `scheme`.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT f.path, s.signature FROM files f JOIN signatures s ON s.file_id = f.id WHERE s.scheme = ?",
+                (scheme,),
+            ).fetchall()
+        return [(path, np.frombuffer(blob, dtype=np.uint32)) for path, blob in rows]
+
+    def token_ids(self, tokens):
+        """
+        Return a dict of token -> id, giving new ids to tokens never seen before.
+
+        Ids are kept in the store so token fingerprints stay comparable
+        across restarts.
+        """
+        with self.lock, self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_tokens (token TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM query_tokens")
+            self.conn.executemany("INSERT OR IGNORE INTO query_tokens (token) VALUES (?)", ((token,) for token in tokens))
+            self.conn.execute("INSERT OR IGNORE INTO tokens (token) SELECT token FROM query_tokens")
+            return dict(self.conn.execute("SELECT t.token, t.id FROM query_tokens q JOIN tokens t ON t.token = q.token"))
+
+    def paths_with_size(self, size):
+        """
+        Return the indexed paths last seen with exactly `size` bytes.
+        """
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT path FROM files WHERE size = ?", (size,))]
+
+    def snapshot(self, directory, schemes=()):
+        """
+        Return {path: (size, mtime_ns, inode, complete)} for every file stored under `directory`.
+
+        `complete` is True if the file has fingerprints or a signature for
+        every one of `schemes`. The rows come from a single range scan of
+        the path index rather than a query per file.
+        """
+        prefix, end = _subtree(directory)
+        placeholders = ', '.join('?' * len(schemes))
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT f.path, f.size, f.mtime_ns, f.inode, "
+                f"(SELECT COUNT(*) FROM fingerprints p WHERE p.file_id = f.id AND p.scheme IN ({placeholders})) + "
+                f"(SELECT COUNT(*) FROM signatures s WHERE s.file_id = f.id AND s.scheme IN ({placeholders})) "
+                "FROM files f WHERE f.path >= ? AND f.path < ?",
+                (*schemes, *schemes, prefix, end),
+            ).fetchall()
+        return {path: (size, mtime_ns, inode, count == len(schemes)) for path, size, mtime_ns, inode, count in rows}
+
+    def completed_scan(self, directory):
+        """
+        Return True if a scan of every file under `directory` has ever run to the end.
+        """
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM scans WHERE directory = ?",
+                                     (os.path.abspath(directory),)).fetchone() is not None
+
+    def add_changes(self, paths):
+        """
+        Remember paths that were added or changed since the last completed scan.
+
+        They are kept until `complete_scan`, so an interrupted scan does not
+        lose them.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO changes (path) VALUES (?)",
+                                  ((os.path.abspath(path),) for path in paths))
+
+    def complete_scan(self, directory):
+        """
+        Record that every file under `directory` was scanned and return the changes collected since the last time.
+
+        Only paths that are still stored are returned; the rest were deleted
+        or could not be fingerprinted.
+        """
+        prefix, end = _subtree(directory)
+        with self.lock, self.conn:
+            changed = [row[0] for row in self.conn.execute(
+                "SELECT c.path FROM changes c JOIN files f ON f.path = c.path "
+                "WHERE c.path >= ? AND c.path < ? AND c.path NOT IN (SELECT path FROM failures)",
+                (prefix, end),
+            )]
+            self.conn.execute("DELETE FROM changes WHERE path >= ? AND path < ?", (prefix, end))
+            self.conn.execute("INSERT OR REPLACE INTO scans (directory, completed_ns) VALUES (?, ?)",
+                              (os.path.abspath(directory), time.time_ns()))
+        return changed
+
+    def failures(self, directory):
+        """
+        Return {path: (size, mtime_ns, inode)} for files under `directory` that could not be fingerprinted.
+        """
+        prefix, end = _subtree(directory)
+        with self.lock:
+            rows = self.conn.execute("SELECT path, size, mtime_ns, inode FROM failures WHERE path >= ? AND path < ?",
+                                     (prefix, end)).fetchall()
+        return {path: (size, mtime_ns, inode) for path, size, mtime_ns, inode in rows}
+
+    def save_failures(self, entries):
+        """
+        Record (path, stat_result) entries for files that could not be fingerprinted at that signature.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO failures (path, size, mtime_ns, inode) VALUES (?, ?, ?, ?)",
+                ((os.path.abspath(path), *file_signature(path, stat_result)) for path, stat_result in entries),
+            )
+
+    def remove_failures(self, paths):
+        """
+        Forget recorded failures of several paths.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM failures WHERE path = ?", ((os.path.abspath(path),) for path in paths))
+
+    def contains(self, path):
+        """
+        Return True if anything is stored for `path`, current or not.
+        """
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone() is not None
+
+    def move(self, src, dest):
+        """
+        Follow a rename of a file, or of a directory and every file below it.
+
+        A rename keeps size, mtime and inode, so the stored fingerprints stay
+        valid and only the paths change. Returns the number of files moved;
+        if nothing is stored under `src` the store is left as it is.
+        """
+        src = os.path.abspath(src)
+        dest = os.path.abspath(dest)
+        src_prefix = src.rstrip(os.sep) + os.sep
+        dest_prefix = dest.rstrip(os.sep) + os.sep
+        with self.lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM files WHERE path = ? OR (path >= ? AND path < ?) LIMIT 1",
+                                 (src, src_prefix, src_prefix[:-1] + chr(ord(os.sep) + 1))).fetchone() is None:
+                return 0
+            # Whatever was stored at the destination has been replaced
+            self.conn.execute("DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)",
+                              (dest, dest_prefix, dest_prefix[:-1] + chr(ord(os.sep) + 1)))
+            moved = self.conn.execute("UPDATE files SET path = ? WHERE path = ?", (dest, src)).rowcount
+            moved += self.conn.execute(
+                "UPDATE files SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+                (dest_prefix, len(src_prefix) + 1, src_prefix, src_prefix[:-1] + chr(ord(os.sep) + 1)),
+            ).rowcount
+        return moved
+
+    def remove(self, path):
+        """
+        Forget everything stored for `path`.
+        """
+        self.remove_many([path])
+
+    def remove_many(self, paths):
+        """
+        Forget everything stored for several paths, in one transaction.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", ((os.path.abspath(path),) for path in paths))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,364 @@
+import os
+import queue
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import numpy as np
+
+MAX_LISTED_FILES = 40  # Filenames spelled out in a confirmation dialog
+
+def load_checked_image(master=None):
+    from PIL import Image, ImageTk  # Only needed once a window is shown
+    checked_img = Image.open("checked.png")
+    checked_img = checked_img.resize((16, 16))  # Resize to 16x16 pixels
+
+    # Convert resized images to PhotoImage
+    return ImageTk.PhotoImage(checked_img, master=master)
+
+class CheckboxTreeview(tk.Frame):
+    """
+    Checkable list of (filename, similarity) rows that stays fast with many results.
+
+    Results are kept in arrays sorted by similarity, highest first, with the
+    checked state in a boolean array. The Treeview itself only holds the
+    `rows` items that fit on screen, which are refilled from the arrays as
+    the list scrolls, so tens of thousands of results cost no more Tk items
+    than a handful, and selecting by threshold is one array comparison.
+    """
+
+    def __init__(self, master, checked_image=None, rows=30, **kwargs):
+        super().__init__(master, **kwargs)
+        self.rows = rows
+        self.top = 0  # Index of the result shown in the first row
+        self.filenames = np.empty(0, dtype=object)
+        self.similarities = np.empty(0)
+        self.checked = np.empty(0, dtype=bool)
+        self.highlighted = np.empty(0, dtype=bool)
+        self.treeview = ttk.Treeview(self, selectmode="extended", columns=("Filename", "Similarity"), height=rows)
+        self.treeview.heading("#0", text="Check")
+        self.treeview.heading("Filename", text="Filename")
+        self.treeview.heading("Similarity", text="Similarity")
+        self.treeview.column("#0", width=50)  # Adjust the width of the Check column if needed
+        self.treeview.column("Filename", width=500)  # Adjust the width of the Filename column as needed
+        self.treeview.column("Similarity", width=100)  # Adjust the width of the Similarity column as needed
+        self.treeview.tag_configure("highlight", background="#cce4ff")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.scroll)
+        self.treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        for row in range(rows):
+            self.treeview.insert("", tk.END, iid=str(row), text="")
+
+        # Share one image across windows instead of reloading it for each
+        self.checked_image = checked_image if checked_image is not None else load_checked_image(self)
+
+        self.treeview.bind("<Button-1>", self.toggle_checkbox)
+        self.treeview.bind("<MouseWheel>", lambda event: self.scroll("scroll", -event.delta // 120, "units"))
+        self.treeview.bind("<Button-4>", lambda event: self.scroll("scroll", -1, "units"))
+        self.treeview.bind("<Button-5>", lambda event: self.scroll("scroll", 1, "units"))
+        self.render()
+
+    def set_results(self, files):
+        """
+        Replace the rows with `files`, a list of (filename, similarity) pairs.
+        """
+        similarities = np.fromiter((similarity for _, similarity in files), dtype=float, count=len(files))
+        order = np.argsort(-similarities, kind="stable")
+        filenames = np.empty(len(files), dtype=object)
+        filenames[:] = [filename for filename, _ in files]
+        self.filenames = filenames[order]
+        self.similarities = similarities[order]
+        self.checked = np.zeros(len(files), dtype=bool)
+        self.highlighted = np.zeros(len(files), dtype=bool)
+        self.scroll_to(0)
+
+    def insert_checkbox(self, index, filename, similarity):
+        """
+        Add one row; `similarity` may be a number or a "NN.NN%" string.
+
+        Rows are always kept in similarity order, so `index` is ignored.
+        Use set_results to add many rows at once.
+        """
+        files = list(zip(self.filenames, self.similarities))
+        files.append((filename, float(str(similarity).rstrip("%"))))
+        checked = set(self.get_checked_items())
+        self.set_results(files)
+        self.checked[:] = [name in checked for name in self.filenames]
+        self.render()
+
+    def remove_items(self, filenames):
+        """
+        Drop the rows of the given filenames, keeping the rest as they are.
+        """
+        filenames = set(filenames)
+        keep = np.fromiter((name not in filenames for name in self.filenames), dtype=bool, count=len(self.filenames))
+        self.filenames = self.filenames[keep]
+        self.similarities = self.similarities[keep]
+        self.checked = self.checked[keep]
+        self.highlighted = self.highlighted[keep]
+        self.scroll_to(self.top)
+
+    def highlight_items(self, filenames):
+        filenames = set(filenames)
+        self.highlighted[:] = [name in filenames for name in self.filenames]
+        self.render()
+
+    def scroll(self, *args):
+        """
+        Scrollbar command: ("moveto", fraction) or ("scroll", count, "units" | "pages").
+        """
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.filenames)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.rows if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, len(self.filenames) - self.rows))
+        self.render()
+
+    def render(self):
+        """
+        Fill the on-screen rows from the arrays, starting at self.top.
+        """
+        for row in range(self.rows):
+            index = self.top + row
+            if index < len(self.filenames):
+                self.treeview.move(str(row), "", row)  # Reattach if it was hidden
+                self.treeview.item(
+                    str(row),
+                    values=(self.filenames[index], f"{self.similarities[index]:.2f}%"),
+                    image=self.checked_image if self.checked[index] else "",
+                    tags=("highlight",) if self.highlighted[index] else (),
+                )
+            elif self.treeview.exists(str(row)):
+                self.treeview.detach(str(row))
+        count = len(self.filenames)
+        if count > self.rows:
+            self.scrollbar.set(self.top / count, (self.top + self.rows) / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def toggle_checkbox(self, event):
+        row = self.treeview.identify_row(event.y)
+        if row:
+            index = self.top + int(row)
+            if index < len(self.filenames):
+                self.checked[index] = not self.checked[index]
+                self.render()
+
+    def get_checked_items(self):
+        return self.filenames[self.checked].tolist()
+
+    def select_items_above_similarity(self, threshold):
+        if self.checked.any():  # If some items are already checked, deselect all
+            self.deselect_all_items()
+        else:  # If no items are checked, select all above the threshold
+            self.checked = self.similarities >= threshold
+            self.render()
+
+    def deselect_all_items(self):
+        self.checked[:] = False
+        self.render()
+
+
+def popup_window(files, file_path, directory, autocheck=True, batch_size=1, master=None, checked_image=None,
+                 on_delete=None):
+    """
+    Show related files and offer to delete them.
+
+    `files` holds (filename, similarity) pairs, filenames relative to `directory`.
+    `on_delete` is called with the path of every file deleted.
+
+    With a `master` (see GuiService) the window is a Toplevel of that root
+    and returns at once; without one it runs its own Tk main loop.
+    """
+    def delete_selected_files():
+        nonlocal files
+        checked_items = checkbox_treeview.get_checked_items()
+        checked = set(checked_items)
+        files_to_delete = [file for file in files if file[0] in checked]  # Accumulate files to delete
+        if files_to_delete:
+            # Construct a confirmation message listing the files to be deleted
+            confirmation_message = f"Are you sure you want to delete the following files?\n\n"
+            confirmation_message += "\n".join(file[0] for file in files_to_delete[:MAX_LISTED_FILES])
+            if len(files_to_delete) > MAX_LISTED_FILES:
+                confirmation_message += f"\n... and {len(files_to_delete) - MAX_LISTED_FILES} more"
+            # Display a confirmation messagebox
+            if messagebox.askyesno("Confirm Deletion", confirmation_message, parent=root):
+                # Delete files and display a success message
+                for file_to_delete in files_to_delete:
+                    filepath = os.path.join(directory, file_to_delete[0])
+                    try:
+                        os.remove(filepath)
+                    except OSError as e:
+                        messagebox.showerror("Error", f"Failed to delete {file_to_delete[0]}: {e}", parent=root)
+                    else:
+                        if on_delete is not None:
+                            on_delete(filepath)
+                files = [file for file in files if file[0] not in checked]
+                messagebox.showinfo("Files Deleted", "Selected files have been deleted successfully.", parent=root)
+                checkbox_treeview.remove_items(checked)
+        elif checked_items:  # Add this condition to check if any files are selected for deletion
+            messagebox.showinfo("No Files Selected", "No files selected for deletion.", parent=root)
+
+    def auto_delete_selected_files():
+        nonlocal files
+        # Files the user checked are taken out of the list and spared
+        checked = set(checkbox_treeview.get_checked_items())
+        files_to_delete = {file[0] for file in files if file[0] in checked}
+        files = [file for file in files if file[0] not in checked]
+        auto_checked_for_deletion = [filename for filename in autochecked_files if filename not in files_to_delete]
+        if auto_checked_for_deletion:
+                # Delete auto-checked files and display a success message
+            for filename in auto_checked_for_deletion:
+                filepath = os.path.join(directory, filename)
+                try:
+                    os.remove(filepath)
+                except OSError as e:
+                    messagebox.showerror("Error", f"Failed to delete {filename}: {e}", parent=root)
+                else:
+                    if on_delete is not None:
+                        on_delete(filepath)
+            messagebox.showinfo("Files Deleted", "Auto-checked files with 100% similarity have been deleted successfully.", parent=root)
+            # Remove auto-checked files from the list before refreshing the treeview
+            deleted = set(auto_checked_for_deletion)
+            files = [file for file in files if file[0] not in deleted]
+            refresh_treeview()
+    def refresh_treeview():
+        # Only the arrays are rebuilt; the Treeview keeps its on-screen rows
+        cur_file = os.path.relpath(file_path, directory)
+        checkbox_treeview.set_results([(filename, similarity) for filename, similarity in files if filename != cur_file])
+
+    def toggle_select(threshold, button):
+        if button.cget('text') != 'Deselect':
+            checkbox_treeview.select_items_above_similarity(threshold)  # Adjust threshold as needed
+            button.config(text='Deselect')
+        else:
+            checkbox_treeview.deselect_all_items()
+            button.config(text=f"Select {threshold}")
+
+
+    root = tk.Tk() if master is None else tk.Toplevel(master)
+    root.title("File Similarity Checker")
+    root.geometry("900x700")
+    root.attributes('-topmost', True)
+    main_frame = tk.Frame(root)
+    main_frame.pack(pady=5)
+
+    checkbox_treeview = CheckboxTreeview(main_frame, checked_image)
+    checkbox_treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    refresh_treeview()
+    autochecked_files = []  
+    matching=""# Files to be auto-checked
+    checkIf=0
+    for filename, similarity in files:
+        cur_file = os.path.relpath(file_path, directory)
+        if filename != cur_file:
+            if autocheck and similarity == 100 and checkIf==1 or checkIf==0:
+                autochecked_files.append(filename)
+                matching="100"
+                checkIf=1
+            elif autocheck and similarity >= 90 and checkIf==2 or checkIf==0:
+                autochecked_files.append(filename)
+                matching="Above 90"
+                checkIf=2
+            elif autocheck and similarity >= 80 and checkIf==3 or checkIf==0:
+                autochecked_files.append(filename)
+                matching="Above 80"
+                checkIf=3
+    if batch_size > 1:
+        label = tk.Label(root, text=f"{file_path} and {batch_size - 1} other new files")
+    else:
+        label = tk.Label(root, text=f"{file_path}")
+    label.pack(pady=5)
+
+    delete_button = tk.Button(root, text="Delete Selected Files", command=delete_selected_files)
+    delete_button.pack(pady=5)
+
+
+    select_90_button = tk.Button(root, text="Select 90", command=lambda: toggle_select(90, select_90_button))
+    select_90_button.pack(pady=5)
+
+    select_80_button = tk.Button(root, text="Select 80", command=lambda: toggle_select(80, select_80_button))
+    select_80_button.pack(pady=5)
+
+    if autocheck and autochecked_files:
+        # Automatically highlight files with 100% similarity
+        checkbox_treeview.highlight_items(autochecked_files)
+
+        new_files = os.path.basename(file_path) if batch_size == 1 else f"the {batch_size} new files"
+        confirmation_message = f"The following files have {matching}% similarity with {new_files}. Do you want to delete them?\n\n"
+        confirmation_message += "\n".join(autochecked_files[:MAX_LISTED_FILES])
+        if len(autochecked_files) > MAX_LISTED_FILES:
+            confirmation_message += f"\n... and {len(autochecked_files) - MAX_LISTED_FILES} more"
+        if messagebox.askyesno("Confirm Deletion", confirmation_message, parent=root):
+            auto_delete_selected_files()  # Delete files if confirmed
+    if master is None:
+        root.mainloop()
+
+
+
+
+# Usage:
+# popup_window([("file1.txt", 90), ("file2.txt", 80)], "path/to/current/file.txt", "path/to/current")
+
+class GuiService:
+    """
+    Own the one Tk root of the program, on the main thread.
+
+    Tk must only be touched from the thread that created it, so pipeline
+    workers never open windows themselves: they `show` results, which puts
+    them on a queue that the main loop drains every `poll_interval`
+    milliseconds. Each result opens a Toplevel; comparisons keep running
+    while windows are open. The icons are loaded, with PIL, when the first
+    window opens and then shared by all of them.
+    """
+
+    def __init__(self, directory, poll_interval=100, on_delete=None):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.on_delete = on_delete  # Called with each path deleted from a result window
+        self.results = queue.Queue()
+        self.root = tk.Tk()
+        self.root.withdraw()  # Only the result windows are shown
+        self.checked_image = None  # Loaded by the first result window
+
+    def show(self, files, file_path, batch_size=1):
+        """
+        Queue a result window; safe to call from any thread.
+        """
+        self.results.put((files, file_path, batch_size))
+
+    def _poll(self):
+        while True:
+            try:
+                files, file_path, batch_size = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.checked_image is None:
+                self.checked_image = load_checked_image(self.root)
+            popup_window(files, file_path, self.directory, batch_size=batch_size, master=self.root,
+                         checked_image=self.checked_image, on_delete=self.on_delete)
+        self.root.after(self.poll_interval, self._poll)
+
+    def every(self, interval, func):
+        """
+        Call `func` on the main thread every `interval` milliseconds.
+        """
+        def tick():
+            func()
+            self.root.after(interval, tick)
+        self.root.after(interval, tick)
+
+    def run(self):
+        """
+        Run the Tk main loop until quit() or Ctrl+C.
+        """
+        self.root.after(self.poll_interval, self._poll)
+        try:
+            self.root.mainloop()
+        except KeyboardInterrupt:
+            pass
+
+    def quit(self):
+        self.root.quit()
@@ -6,6 +6,7 @@ from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import tkinter as tk
 from tkinter import ttk, messagebox
+from fingerprint import rolling_hash, fingerprint_set, jaccard
 
 class CheckboxTreeview(tk.Frame):
     def __init__(self, master, **kwargs):
@@ -54,25 +55,6 @@ class CheckboxTreeview(tk.Frame):
         return checked_items
 
 
-def rolling_hash(text, window_size):
-    """
-    Compute rolling hash values for all windows of size `window_size`.
-    """
-    hash_values = []
-    text_len = len(text)
-    prime = 101  # Choose a prime number
-    modulus = 2**32  # Typically a large prime number
-    hash_value = 0
-    for i in range(window_size):
-        hash_value = (hash_value * prime + ord(text[i])) % modulus
-    hash_values.append(hash_value)
-
-    for i in range(1, text_len - window_size + 1):
-        hash_value = (hash_value * prime - ord(text[i - 1]) * pow(prime, window_size, modulus) + ord(text[i + window_size - 1])) % modulus
-        hash_values.append(hash_value)
-
-    return hash_values
-
 def find_similarity(file1, file2, window_size):
     """
     Find similarity between two text files using rolling hashing.
@@ -81,11 +63,10 @@ def find_similarity(file1, file2, window_size):
         text1 = f1.read()
         text2 = f2.read()
 
-    hash_values1 = set(rolling_hash(text1, window_size))
-    hash_values2 = set(rolling_hash(text2, window_size))
+    hash_values1 = fingerprint_set(rolling_hash(text1, window_size))
+    hash_values2 = fingerprint_set(rolling_hash(text2, window_size))
 
-    common_hashes = hash_values1.intersection(hash_values2)
-    similarity = (len(common_hashes) / (len(hash_values1) + len(hash_values2) - len(common_hashes))) * 100
+    similarity = jaccard(hash_values1, hash_values2) * 100
 
     return similarity
 
@@ -0,0 +1,160 @@
+import hashlib
+import threading
+import zlib
+
+import numpy as np
+
+from sha256 import preprocess_text, generate_shingles
+
+HASH_PRIME = 2**32 + 15  # Smallest prime above 2**32; a * x + b still fits in uint64
+NUM_PERM = 128
+CHUNK_SIZE = 8192  # Shingles hashed per step, bounds the NUM_PERM x CHUNK_SIZE matrix
+EMPTY = 2**32 - 1  # Every value of the signature of an empty shingle set
+
+
+def shingle_hashes(text, k):
+    """
+    Hash the k-word shingles of `text` into a uint32 array.
+    """
+    shingles = generate_shingles(preprocess_text(text), k)
+    return np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint32, count=len(shingles))
+
+
+def permutations(num_perm=NUM_PERM, seed=1):
+    """
+    Return the (a, b) coefficients of `num_perm` universal hash functions.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(hashes, num_perm=NUM_PERM, seed=1):
+    """
+    Compute a fixed-size MinHash signature (num_perm x uint32) of a hash set.
+
+    An empty set (a text shorter than one shingle, or nothing extracted)
+    gives all EMPTY values; see `is_empty_signature`.
+    """
+    a, b = permutations(num_perm, seed)
+    signature = np.full(num_perm, 2**32 - 1, dtype=np.uint32)
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    for start in range(0, len(hashes), CHUNK_SIZE):
+        chunk = hashes[start:start + CHUNK_SIZE]
+        permuted = (np.outer(a, chunk) + b[:, None]) % HASH_PRIME
+        signature = np.minimum(signature, (permuted & 0xFFFFFFFF).min(axis=1).astype(np.uint32))
+    return signature
+
+
+def is_empty_signature(signature):
+    """
+    Return True if `signature` is that of an empty shingle set.
+
+    All such signatures are equal, so they must not be compared: two
+    unrelated short texts would look identical.
+    """
+    return bool(np.all(np.asarray(signature) == EMPTY))
+
+
+def estimate_jaccard(signature1, signature2):
+    """
+    Estimate the Jaccard similarity of two sets from their MinHash signatures.
+    """
+    return float(np.count_nonzero(signature1 == signature2)) / len(signature1)
+
+
+def lsh_threshold(bands, rows):
+    """
+    Jaccard similarity at which a pair becomes a candidate with probability ~1/2.
+    """
+    return (1 / bands) ** (1 / rows)
+
+
+class LSHIndex:
+    """
+    Banding index over MinHash signatures.
+
+    Each signature is cut into `bands` bands of `rows` values; two documents
+    become candidates when any band matches exactly. Fewer rows per band
+    lower the Jaccard threshold (see `lsh_threshold`), more rows raise it.
+    Signatures of empty shingle sets are never indexed and have no candidates.
+    """
+
+    def __init__(self, bands=16, rows=8):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}  # key -> signature, for removal and similarity estimates
+        self.lock = threading.Lock()
+
+    @property
+    def threshold(self):
+        return lsh_threshold(self.bands, self.rows)
+
+    def _band_ids(self, signature):
+        if len(signature) != self.bands * self.rows:
+            raise ValueError(f"signature has {len(signature)} values, expected {self.bands} bands x {self.rows} rows")
+        signature = np.ascontiguousarray(signature, dtype=np.uint32)
+        return [
+            hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest()
+            for band in range(self.bands)
+        ]
+
+    def insert(self, key, signature):
+        """
+        Add (or replace) the signature stored under `key`.
+        """
+        band_ids = self._band_ids(signature)
+        with self.lock:
+            if is_empty_signature(signature):
+                self._remove(key)
+                return
+            self._insert(key, signature, band_ids)
+
+    def _insert(self, key, signature, band_ids):
+        self._remove(key)
+        for buckets, band_id in zip(self.buckets, band_ids):
+            buckets.setdefault(band_id, set()).add(key)
+        self.signatures[key] = signature
+
+    def remove(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def move(self, key, new_key):
+        """
+        Keep the signature stored under `key` under `new_key` instead, without recomputing it.
+        """
+        with self.lock:
+            signature = self.signatures.get(key)
+            if signature is not None:
+                self._remove(key)
+                self._insert(new_key, signature, self._band_ids(signature))
+
+    def _remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_id in zip(self.buckets, self._band_ids(signature)):
+            bucket = buckets.get(band_id)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band_id]
+
+    def query(self, signature):
+        """
+        Return the keys sharing at least one band with `signature`.
+        """
+        candidates = set()
+        band_ids = self._band_ids(signature)
+        if is_empty_signature(signature):
+            return candidates
+        with self.lock:
+            for buckets, band_id in zip(self.buckets, band_ids):
+                candidates.update(buckets.get(band_id, ()))
+        return candidates
+
+    def __len__(self):
+        return len(self.signatures)
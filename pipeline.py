@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+
+STOP = object()  # Sentinel telling a worker thread to exit
+
+
+class Stage:
+    """
+    One step of a pipeline: a bounded queue drained by worker threads.
+
+    `func` is called with each item; its return value is passed to the next
+    stage, and returning None drops the item. When the queue is full `put`
+    blocks, so a slow stage pushes back on the stages feeding it instead of
+    letting work pile up in memory.
+    """
+
+    def __init__(self, name, func, workers=1, maxsize=64):
+        self.name = name
+        self.func = func
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize)
+        self.next = None
+        self.lock = threading.Lock()
+        self.active = 0  # Items being worked on right now
+        self.processed = 0
+        self.failed = 0
+        self.blocked = 0  # Puts that had to wait for room in the queue
+        self.threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.blocked += 1
+            print(f"[{self.name}] queue full ({self.maxsize} waiting), holding back upstream")
+            self.queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is STOP:
+                self.queue.task_done()
+                return
+            with self.lock:
+                self.active += 1
+            self._handle(item)
+            with self.lock:
+                self.active -= 1
+            self.queue.task_done()
+
+    def _handle(self, item):
+        try:
+            result = self.func(item)
+        except Exception as e:
+            print(f"[{self.name}] failed on {item!r}: {e}")
+            with self.lock:
+                self.failed += 1
+            return False
+        with self.lock:
+            self.processed += 1
+        # Hand on before counting the item as finished, so busy() never misses it in between
+        if result is not None and self.next is not None:
+            self.next.put(result)
+        return True
+
+    def status(self):
+        return (f"{self.name}: {self.queue.qsize()}/{self.maxsize} queued, {self.active} active, "
+                f"{self.processed} done, {self.failed} failed, {self.blocked} blocked")
+
+
+class BatchStage(Stage):
+    """
+    A stage whose single worker calls `func` with lists of items.
+
+    A batch opens with the first item and closes once no new item has come
+    in for `window` seconds, after `max_delay` seconds in any case, or at
+    `max_items`, so a burst of events turns into one call.
+    """
+
+    def __init__(self, name, func, window=0.5, max_delay=5.0, max_items=1000, maxsize=64):
+        super().__init__(name, func, workers=1, maxsize=maxsize)
+        self.window = window
+        self.max_delay = max_delay
+        self.max_items = max_items
+        self.batches = 0
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is STOP:
+                self.queue.task_done()
+                return
+            with self.lock:
+                self.active += 1
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_items:
+                timeout = min(self.window, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                with self.lock:
+                    self.active += 1
+            succeeded = self._handle(batch)
+            with self.lock:
+                self.active -= len(batch)
+                # _handle counted the batch as one item
+                if succeeded:
+                    self.processed += len(batch) - 1
+                else:
+                    self.failed += len(batch) - 1
+                self.batches += 1
+            for _ in batch:
+                self.queue.task_done()
+        self.queue.task_done()  # For the STOP that ended the last batch
+
+    def status(self):
+        return f"{super().status()}, {self.batches} batches"
+
+
+class Pipeline:
+    """
+    A chain of stages; items submitted to the first flow through the rest.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage
+
+    def start(self):
+        for stage in self.stages:
+            for thread in stage.threads:
+                thread.start()
+
+    def submit(self, item):
+        self.stages[0].put(item)
+
+    def busy(self):
+        return any(stage.queue.qsize() or stage.active for stage in self.stages)
+
+    def status(self):
+        return " | ".join(stage.status() for stage in self.stages)
+
+    def stop(self):
+        """
+        Let queued work drain, then stop every worker thread, stage by stage.
+        """
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(STOP)
+            for thread in stage.threads:
+                thread.join()
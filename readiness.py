@@ -0,0 +1,82 @@
+import os
+import threading
+
+FIRST_POLL_INTERVAL = 0.05  # Seconds; small files are usually complete by the first check
+MAX_POLL_INTERVAL = 2.0  # Back-off cap while a file keeps growing
+
+
+def close_events_supported(observer):
+    """
+    Return True if `observer` reports close-after-write events (Linux inotify).
+    """
+    try:
+        from watchdog.observers.inotify import InotifyObserver
+    except ImportError:  # watchdog only ships the inotify backend on Linux
+        return False
+    return isinstance(observer, InotifyObserver)
+
+
+def _stat_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class ReadinessTracker:
+    """
+    Decide when a newly created file has been completely written.
+
+    Where the observer reports close-after-write (inotify IN_CLOSE_WRITE) the
+    file is ready as soon as its writer closes it, and a file renamed into
+    place (IN_MOVED_TO, e.g. a finished browser download) is ready at once.
+    Otherwise size and mtime are polled until they hold still for one
+    interval; the interval starts short and doubles while the file keeps
+    changing, so small files are picked up almost immediately and slow
+    downloads are not read half-written. With close events available polling
+    is only a safety net, for files that appear without a close (moved in
+    from another filesystem), and waits the full MAX_POLL_INTERVAL.
+    """
+
+    def __init__(self, close_events=False, first_interval=FIRST_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.close_events = close_events
+        self.first_interval = first_interval
+        self.max_interval = max_interval
+        self.lock = threading.Lock()
+        self.closed = {}  # path -> Event set once the writer has closed the file
+
+    def expect(self, path):
+        """
+        Start tracking a file that was just created.
+        """
+        with self.lock:
+            self.closed.setdefault(path, threading.Event())
+
+    def mark_closed(self, path):
+        """
+        Record that a tracked file was closed after writing, or renamed into place.
+        """
+        with self.lock:
+            event = self.closed.get(path)
+        if event is not None:
+            event.set()
+
+    def wait(self, path):
+        """
+        Block until `path` is complete; return False if it disappeared meanwhile.
+        """
+        with self.lock:
+            event = self.closed.setdefault(path, threading.Event())
+        interval = self.max_interval if self.close_events else self.first_interval
+        try:
+            previous = _stat_signature(path)
+            while not event.wait(interval):
+                current = _stat_signature(path)
+                if current == previous:
+                    return True
+                previous = current
+                interval = min(interval * 2, self.max_interval)
+            return os.path.isfile(path)
+        except FileNotFoundError:
+            return False
+        finally:
+            with self.lock:
+                self.closed.pop(path, None)
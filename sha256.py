@@ -57,6 +57,7 @@ def main(file1_path, file2_path, k=3, num_buckets=1000):
 
 
 # Example usage:
-file1_path = "note.txt"
-file2_path = "note copy.txt"
-main(file1_path, file2_path)
+if __name__ == "__main__":
+    file1_path = "note.txt"
+    file2_path = "note copy.txt"
+    main(file1_path, file2_path)
@@ -0,0 +1,126 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+class TextCache:
+    """
+    LRU cache of extracted file text, bounded by the memory the strings use.
+
+    Every entry remembers the size and mtime of the file it was read from
+    and is only returned while the file still matches, so a file edited in
+    place is read again instead of served stale. When the total size of the
+    cached strings exceeds `max_bytes` the least recently used entries are
+    evicted; a single text larger than the whole budget is not cached.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> (size, mtime_ns, text, nbytes), least recently used first
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # Misses because the file changed since it was cached
+        self.evictions = 0
+
+    def get(self, path, stat_result=None):
+        """
+        Return the cached text of `path`, or None if missing or stale.
+        """
+        path = os.path.abspath(path)
+        st = stat_result if stat_result is not None else os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[:2] != (st.st_size, st.st_mtime_ns):
+                self._discard(path)
+                self.misses += 1
+                self.stale += 1
+                return None
+            self.entries.move_to_end(path)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, path, text, stat_result=None):
+        """
+        Cache `text` as the contents of `path` at its current size and mtime.
+        """
+        path = os.path.abspath(path)
+        st = stat_result if stat_result is not None else os.stat(path)
+        nbytes = sys.getsizeof(text)
+        with self.lock:
+            self._discard(path)
+            if nbytes > self.max_bytes:
+                return
+            self.entries[path] = (st.st_size, st.st_mtime_ns, text, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted[3]
+                self.evictions += 1
+
+    def get_or_load(self, path, load):
+        """
+        Return the text of `path`, calling `load(path)` only on a miss.
+        """
+        stat_result = os.stat(path)  # Stat before loading so edits made meanwhile look stale
+        text = self.get(path, stat_result)
+        if text is None:
+            text = load(path)
+            if text is not None:  # Extractors return None on errors; try again next time
+                self.put(path, text, stat_result)
+        return text
+
+    def discard(self, path):
+        """
+        Drop the cached text of `path`, or of every file below it if it is a directory.
+        """
+        path = os.path.abspath(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        with self.lock:
+            for cached in [p for p in self.entries if p == path or p.startswith(prefix)]:
+                self._discard(cached)
+
+    def move(self, src, dest):
+        """
+        Keep cached text after `src`, a file or a directory, was renamed to `dest`.
+        """
+        src = os.path.abspath(src)
+        dest = os.path.abspath(dest)
+        if src == dest:
+            return
+        prefix = src.rstrip(os.sep) + os.sep
+        with self.lock:
+            for cached in [p for p in self.entries if p == src or p.startswith(prefix)]:
+                moved = dest + cached[len(src):]
+                self._discard(moved)
+                self.entries[moved] = self.entries.pop(cached)
+
+    def _discard(self, path):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self.entries)
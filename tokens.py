@@ -0,0 +1,91 @@
+import threading
+from array import array
+
+import numpy as np
+
+from fingerprint import mix_ids
+from sha256 import preprocess_text
+from extraction import LAST_WHITESPACE
+
+
+class Vocabulary:
+    """
+    Intern tokens to small integer ids that are stable across restarts.
+
+    Ids live in the FingerprintStore; the ones already used in this process
+    are kept in memory, so the store is only asked about new tokens.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def intern(self, tokens):
+        """
+        Return the ids of `tokens`, in order, as an array('I').
+        """
+        ids = self.ids
+        missing = [token for token in dict.fromkeys(tokens) if token not in ids]
+        if missing:
+            with self.lock:
+                ids.update(self.store.token_ids(missing))
+        return array('I', map(ids.__getitem__, tokens))
+
+
+def iter_tokens(text_chunks):
+    """
+    Yield the words of a text that arrives in pieces, as lists.
+
+    Words are those of sha256's preprocess_text (lowercased, punctuation
+    removed); each piece is cut after its last whitespace so no word is
+    split between two lists.
+    """
+    pending = ''
+    for chunk in text_chunks:
+        pending += chunk
+        match = LAST_WHITESPACE.search(pending)
+        if match is None:
+            continue
+        yield preprocess_text(pending[:match.start()])
+        pending = pending[match.start():]
+    yield preprocess_text(pending)
+
+
+def iter_indexed_tokens(text_chunks):
+    """
+    Yield the words of a text that arrives in pieces, as (distinct words, indexes) pairs.
+
+    The pieces are those of iter_tokens, and `distinct[i]` for each i in
+    the uint32 `indexes` gives the words of a piece in order. Each distinct
+    word is kept once per piece, so pieces are compact to hand from a
+    worker process to the one that interns them.
+    """
+    for words in iter_tokens(text_chunks):
+        if not words:
+            continue
+        positions = {}
+        indexes = np.fromiter((positions.setdefault(word, len(positions)) for word in words),
+                              dtype=np.uint32, count=len(words))
+        yield list(positions), indexes
+
+
+def iter_token_codes(text_chunks, vocabulary):
+    """
+    Yield uint32 codes of the interned words of a text, ready for rolling hashes.
+
+    Feeding these to iter_rolling_hashes hashes windows of k words instead
+    of k characters.
+    """
+    return iter_word_codes(iter_indexed_tokens(text_chunks), vocabulary)
+
+
+def iter_word_codes(indexed_words, vocabulary):
+    """
+    Yield uint32 codes for (distinct words, indexes) pieces from iter_indexed_tokens.
+
+    Only the distinct words of each piece are interned.
+    """
+    for distinct, indexes in indexed_words:
+        ids = np.frombuffer(vocabulary.intern(distinct), dtype=np.uint32)  # array('I') is 4 bytes wide
+        yield mix_ids(ids[indexes])
@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+WALK_WORKERS = 8  # Directories scanned at once; scandir releases the GIL while it waits on the disk
+
+
+def _scan(directory, extensions, min_size, max_size):
+    """
+    List one directory: return (matching files as (path, stat_result), subdirectories).
+
+    Extensions are checked on the name and file/directory type comes from
+    the DirEntry, so only files that pass the extension filter are stat'ed,
+    and that stat result is handed on instead of being taken again later.
+    """
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                        continue
+                    if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stat_result = entry.stat()
+                except OSError:  # Vanished or unreadable while we looked
+                    continue
+                if stat_result.st_size < min_size or (max_size is not None and stat_result.st_size > max_size):
+                    continue
+                files.append((entry.path, stat_result))
+    except OSError as e:
+        print(f"Skipping unreadable directory {directory}: {e}")
+    return files, subdirectories
+
+
+def walk_files(directory, extensions=None, min_size=0, max_size=None, workers=WALK_WORKERS):
+    """
+    Yield (path, stat_result) for every matching file under `directory`, recursively.
+
+    Like the recursive observer, the whole tree is covered. Symlinked
+    directories are not followed. Subdirectories are scanned in parallel
+    on `workers` threads, so files come out in no particular order.
+    """
+    if extensions is not None:
+        extensions = {extension.lower() for extension in extensions}
+    if workers <= 1:
+        stack = [directory]
+        while stack:
+            files, subdirectories = _scan(stack.pop(), extensions, min_size, max_size)
+            yield from files
+            stack.extend(subdirectories)
+        return
+    with ThreadPoolExecutor(workers) as pool:
+        pending = {pool.submit(_scan, directory, extensions, min_size, max_size)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirectories = future.result()
+                yield from files
+                pending.update(pool.submit(_scan, subdirectory, extensions, min_size, max_size)
+                               for subdirectory in subdirectories)
+
+
+def in_tree(path, directory):
+    """
+    Return True if `path` lies anywhere under `directory` (both absolute).
+    """
+    return path.startswith(directory.rstrip(os.sep) + os.sep)